@@ -1,11 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from llm_integration import LLMProcessor
 from site_search import SiteSearchEngine
+from profiling import Profiler, span
+from stream_buffer import ChatStreamBroker
+from summary_tree import SummaryTreeBuilder, is_broad_question
+from deadline import CostEstimator, Deadline, DeadlineExceeded
+from list_query import ListQueryEngine
+from typing import Awaitable, Callable, List, Optional
 import orjson
 import asyncio
 import os
+import time
+from contextlib import aclosing
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,28 +21,218 @@ load_dotenv()
 app = FastAPI()
 search_engine = SiteSearchEngine()
 llm_processor = LLMProcessor()
+profiler = Profiler()
+stream_broker = ChatStreamBroker(search_engine.redis)
+summary_builder = SummaryTreeBuilder(search_engine, llm_processor)
+list_engine = ListQueryEngine()
+# Секунды на 1000 символов контента в промпте, уточняется по фактическим вызовам LLM
+llm_costs = CostEstimator({"llm": float(os.getenv("LLM_COST_PER_1K_CHARS", "2.0"))})
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+SUMMARY_REFRESH_INTERVAL = int(os.getenv("SUMMARY_REFRESH_INTERVAL", "0"))
+background_tasks = []
+
+@app.on_event("startup")
+async def startup():
+    await search_engine.initialize()
+    await summary_builder.initialize()
+    if SUMMARY_REFRESH_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(
+            summary_builder.refresh_periodically(SUMMARY_REFRESH_INTERVAL)
+        ))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await stream_broker.close()
+    summary_builder.close()
+    await search_engine.close()
 
 # Модель запроса
 class ChatRequest(BaseModel):
     site_name: str
     question: str
+    latency_budget_ms: Optional[int] = Field(None, gt=0)
 
-@app.post("/api/chat")
-async def chat_handler(request: ChatRequest):
-    async def generate_response():
+async def within_deadline(call: Callable[[], Awaitable], deadline: Deadline):
+    """Run call, cancelling it when the request deadline passes"""
+    try:
+        return await asyncio.wait_for(call(), timeout=None if deadline.expires is None else deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("timeout")
+
+async def call_llm(call: Callable[[], Awaitable], chars: int, deadline: Deadline, source: str):
+    """LLM call bounded by the request deadline; raises DeadlineExceeded instead of running late"""
+    units = 1 + chars / 1000
+    if not deadline.allows(llm_costs.expected("llm", units)):
+        raise DeadlineExceeded("deadline")
+
+    started = time.perf_counter()
+    with span("llm", source=source, chars=chars):
+        result = await within_deadline(call, deadline)
+    llm_costs.observe("llm", time.perf_counter() - started, units)
+    return result
+
+async def answer_from_summary(request: ChatRequest, deadline: Deadline, skipped: List[dict]) -> Optional[dict]:
+    """Broad questions are answered with one prompt over the site's summary tree, None if it cannot answer"""
+    try:
+        with span("summary_lookup"):
+            summary = await within_deadline(lambda: summary_builder.get_context(request.site_name), deadline)
+        if not summary:
+            return None
+
+        context, info = summary
+        processed = await call_llm(
+            lambda: llm_processor.process_summary_query(data=context, question=request.question),
+            len(context), deadline, "summary"
+        )
+    except DeadlineExceeded as e:
+        skipped.append({"type": "summary", "reason": e.reason})
+        return None
+    if processed is None:
+        # В кратких содержаниях ответа нет — идём по исходным материалам
+        return None
+    return {
+        "content": processed,
+        "metadata": {"type": "summary", **info},
+        "source": "summary"
+    }
+
+def structured_list_answer(chunk: dict, question: str) -> Optional[tuple]:
+    """Aggregates over a list are computed directly; the LLM only words the small result"""
+    metadata = chunk["metadata"]
+    with span("list_query", rows=len(chunk["rows"])) as attrs:
+        result = list_engine.answer(str(metadata["id"]), metadata["name"], chunk["rows"], question)
+        attrs["recognized"] = result is not None
+    if not result:
+        return None
+    return result.describe(), {**metadata, "structured": result.to_dict()}
+
+async def answer_from_lists(request: ChatRequest, deadline: Deadline, skipped: List[dict]) -> list:
+    # Сначала считаем по всем спискам, чтобы не держать курсор БД во время вызовов LLM
+    async def compute():
+        return [
+            structured
+            async for chunk in search_engine.get_site_lists(request.site_name)
+            if (structured := structured_list_answer(chunk, request.question))
+        ]
+
+    try:
+        results = await within_deadline(compute, deadline)
+    except DeadlineExceeded as e:
+        skipped.append({"type": "list", "reason": e.reason})
+        return []
+
+    answers = []
+    for data, metadata in results:
         try:
-            async for chunk in search_engine.get_site_content(request.site_name):
-                processed = await llm_processor.process_query(
-                    data=chunk["content"],
-                    question=request.question
-                )
-
-                yield orjson.dumps({
-                    "content": processed,
-                    "metadata": chunk["metadata"],
-                    "source": chunk["metadata"]["type"]
-                }) + b"\n"
-        except Exception as e:
-            yield orjson.dumps({"error": str(e)})
-
-    return StreamingResponse(generate_response(), media_type="application/json")
+            processed = await call_llm(
+                lambda: llm_processor.process_query(data=data, question=request.question),
+                len(data), deadline, "structured"
+            )
+        except DeadlineExceeded:
+            # Результат уже посчитан — без LLM отдаём его как есть
+            processed = data
+        answers.append({
+            "content": processed,
+            "metadata": metadata,
+            "source": metadata["type"]
+        })
+    return answers
+
+async def produce_chat_events(request: ChatRequest, x_profile: Optional[str]):
+    profile = profiler.start("/api/chat", x_profile, site=request.site_name, question=request.question)
+    deadline = Deadline(request.latency_budget_ms)
+    skipped = []
+    try:
+        answers = []
+        if is_broad_question(request.question):
+            # Точный ответ по таблицам важнее пересказа из дерева кратких содержаний
+            answers = await answer_from_lists(request, deadline, skipped)
+            if not answers:
+                answer = await answer_from_summary(request, deadline, skipped)
+                answers = [answer] if answer else []
+        if answers:
+            for answer in answers:
+                yield answer
+        elif not deadline.expired:
+            async with aclosing(search_engine.get_site_content(request.site_name, deadline, skipped)) as chunks:
+                async for chunk in chunks:
+                    data, metadata = chunk["content"], chunk["metadata"]
+                    if "rows" in chunk:
+                        structured = structured_list_answer(chunk, request.question)
+                        if structured:
+                            data, metadata = structured
+
+                    try:
+                        processed = await call_llm(
+                            lambda: llm_processor.process_query(data=data, question=request.question),
+                            len(data), deadline, metadata["type"]
+                        )
+                    except DeadlineExceeded as e:
+                        skipped.append({**metadata, "reason": e.reason})
+                        if e.reason == "timeout" or deadline.expired:
+                            break
+                        continue
+
+                    yield {
+                        "content": processed,
+                        "metadata": metadata,
+                        "source": metadata["type"]
+                    }
+
+        # Пропущенные источники можно запросить повторно: их файлы догружаются в фоне
+        if skipped:
+            yield {"partial": True, "skipped": skipped}
+    finally:
+        profiler.finish(profile)
+
+    # Таймлайн возвращаем только тому, кто явно попросил профилирование
+    if profile.profiled and x_profile:
+        yield {"profile": profile.to_dict()}
+
+def stream_events(request_id: str, cursor: Optional[str]) -> StreamingResponse:
+    async def generate_response():
+        async for event_id, event in stream_broker.subscribe(request_id, cursor):
+            yield orjson.dumps({"event_id": event_id, **event}) + b"\n"
+
+    return StreamingResponse(
+        generate_response(),
+        media_type="application/json",
+        headers={"X-Chat-Request-Id": request_id}
+    )
+
+@app.post("/api/chat")
+async def chat_handler(request: ChatRequest, x_profile: Optional[str] = Header(None)):
+    # Одинаковые запросы, пока первый ещё считается, делят одно вычисление.
+    # Профилируемые считаются отдельно: таймлайн и дамп получает только тот, кто их запросил
+    dedupe_key = None if x_profile else ChatStreamBroker.make_dedupe_key(
+        request.site_name, request.question, str(request.latency_budget_ms or "")
+    )
+    request_id = await stream_broker.start(lambda: produce_chat_events(request, x_profile), dedupe_key)
+    return stream_events(request_id, None)
+
+@app.get("/api/chat/{request_id}")
+async def resume_chat(
+    request_id: str,
+    cursor: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None)
+):
+    """Reconnect to a chat stream and receive the events after the cursor"""
+    cursor = cursor or last_event_id
+    # Проверяем до начала стрима: ошибка XREAD после отправленного 200 оборвала бы ответ
+    if cursor is not None and not ChatStreamBroker.is_valid_cursor(cursor):
+        raise HTTPException(status_code=400, detail="Invalid cursor, expected a stream event_id like 1700000000000-0")
+    if not await stream_broker.exists(request_id):
+        raise HTTPException(status_code=404, detail="Chat request not found or expired")
+    return stream_events(request_id, cursor)
+
+@app.get("/api/admin/slow-requests")
+async def slow_requests(limit: int = 20, x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "threshold_ms": profiler.slow_ms,
+        "sample_rate": profiler.sample_rate,
+        "requests": profiler.get_slow_requests(limit)
+    }
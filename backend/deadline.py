@@ -0,0 +1,49 @@
+import time
+from typing import Dict, Optional
+
+
+class DeadlineExceeded(Exception):
+    """Work was not started ("deadline") or did not finish ("timeout") within the budget"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Deadline:
+    """Latency budget of one request"""
+
+    def __init__(self, budget_ms: Optional[int]):
+        self.expires = time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+    def remaining(self) -> float:
+        if self.expires is None:
+            return float("inf")
+        return max(0.0, self.expires - time.monotonic())
+
+    def allows(self, expected_seconds: float) -> bool:
+        return self.remaining() >= expected_seconds
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CostEstimator:
+    """
+    Exponentially weighted average of observed costs per kind of work,
+    measured in seconds per unit (per MB of file, per 1000 prompt characters).
+    """
+
+    def __init__(self, defaults: Dict[str, float], alpha: float = 0.2):
+        self.rates = dict(defaults)
+        self.alpha = alpha
+
+    def expected(self, kind: str, units: float = 1.0) -> float:
+        return self.rates[kind] * units
+
+    def observe(self, kind: str, seconds: float, units: float = 1.0) -> None:
+        if units <= 0:
+            return
+        rate = seconds / units
+        self.rates[kind] = (1 - self.alpha) * self.rates[kind] + self.alpha * rate
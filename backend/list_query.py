@@ -0,0 +1,514 @@
+import hashlib
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+NUMERIC, BOOL, TEXT = "numeric", "bool", "text"
+
+COUNT_WORDS = ["сколько", "количеств", "число"]
+SUM_WORDS = ["сумм", "итого", "всего", "в общей сложности", "общее", "общий", "общая"]
+MEAN_WORDS = ["средн"]
+MAX_WORDS = ["максимальн", "наибольш", "больше всего", "больше всех", "самый больш", "самая больш",
+             "самое больш", "самый высок", "самая высок", "позже всех", "позднее всех", "самый поздн"]
+MIN_WORDS = ["минимальн", "наименьш", "меньше всего", "меньше всех", "самый мал", "самая мал",
+             "самое мал", "раньше всех", "ранее всех", "самый ранн", "самый стар", "самая стар", "самое стар"]
+GROUP_PATTERN = r"(?:\bпо\b|\bдля кажд\w*|\bв кажд\w*)\s+(\w+)"
+
+GT_WORDS = ["больше", "более", "свыше", "выше", "после", "позже", "от"]
+LT_WORDS = ["меньше", "менее", "ниже", "раньше", "до"]
+MULTIPLIERS = {"тыс": 1e3, "тысяч": 1e3, "млн": 1e6, "миллион": 1e6, "млрд": 1e9, "миллиард": 1e9}
+NUMBER_PATTERN = r"(\d[\d\s]*(?:[.,]\d+)?)\s*(тыс\w*|млн|миллион\w*|млрд|миллиард\w*)?"
+NEGATIONS = {"не", "кроме", "без", "помимо", "исключая"}
+# Служебные слова вопроса; всё остальное должно совпасть с колонкой, значением, списком или ключевым словом
+FUNCTION_WORDS = {
+    "сколько", "какой", "какая", "какое", "какие", "каков", "какова", "каковы", "который", "которая",
+    "которое", "которые", "в", "во", "на", "у", "с", "со", "и", "по", "из", "для", "к", "о", "об",
+    "при", "за", "среди", "чем", "ли", "есть", "все", "всё", "всех", "всего", "это", "этот", "эта",
+    "эти", "каждом", "каждого", "каждой", "каждому", "каждый", "записей", "записи", "строк",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _keyword_words() -> List[str]:
+    phrases = COUNT_WORDS + SUM_WORDS + MEAN_WORDS + MAX_WORDS + MIN_WORDS + GT_WORDS + LT_WORDS + list(MULTIPLIERS)
+    return sorted({w for phrase in phrases for w in phrase.split()})
+
+
+KEYWORD_WORDS = _keyword_words()
+
+
+def stem(word: str) -> str:
+    """Crude Russian stem: drop the inflection so "Париже" and "Париж" match"""
+    return word if len(word) <= 4 else word[:max(4, len(word) - 2)]
+
+
+def significant_words(phrase: str) -> List[str]:
+    return [w for w in tokenize(phrase) if len(w) > 2 or w.isdigit()]
+
+
+def match_ratio(tokens: List[str], phrase: str) -> float:
+    """Share of significant words of phrase that appear in tokens, up to inflection"""
+    words = significant_words(phrase)
+    if not words:
+        return 0.0
+    return sum(any(t.startswith(stem(w)) for t in tokens) for w in words) / len(words)
+
+
+def mentions(tokens: List[str], phrase: str) -> bool:
+    return match_ratio(tokens, phrase) == 1.0
+
+
+def parse_number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace(" ", "").replace(" ", "").replace(",", ".")
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass
+class Column:
+    name: str
+    kind: str
+    values: np.ndarray
+    present: np.ndarray
+
+
+class ListTable:
+    """Columnar copy of a list: one NumPy array per column with an inferred type"""
+
+    def __init__(self, name: str, rows: List[Dict]):
+        self.name = name
+        self.size = len(rows)
+        names: Dict[str, None] = {}
+        for row in rows:
+            names.update(dict.fromkeys(row))
+        self.columns = {n: self._build_column(n, [row.get(n) for row in rows]) for n in names}
+        self.common_words = self._common_words()
+
+    def _common_words(self) -> set:
+        """Words found in at least half of a text column's values («Музей» in «Музей №5»)"""
+        words = set()
+        for column in self.columns.values():
+            if column.kind != TEXT:
+                continue
+            values = column.values[column.present]
+            counts: Dict[str, int] = {}
+            for value in values:
+                for word in set(tokenize(value)):
+                    counts[word] = counts.get(word, 0) + 1
+            words.update(w for w, n in counts.items() if n * 2 >= len(values) and not w.isdigit())
+        return words
+
+    @staticmethod
+    def _build_column(name: str, raw: List) -> Column:
+        present = np.array([v is not None and v != "" for v in raw], dtype=bool)
+        values = [v for v in raw if v is not None and v != ""]
+
+        if values and all(isinstance(v, bool) for v in values):
+            return Column(name, BOOL, np.array([bool(v) for v in raw], dtype=bool), present)
+
+        numbers = [parse_number(v) for v in raw]
+        if values and all(n is not None for n, p in zip(numbers, present) if p):
+            return Column(name, NUMERIC, np.array([n if n is not None else np.nan for n in numbers]), present)
+
+        return Column(name, TEXT, np.array([str(v).strip().lower() if v is not None else "" for v in raw], dtype=object), present)
+
+    def distinct(self, column: Column) -> np.ndarray:
+        return np.unique(column.values[column.present])
+
+
+@dataclass
+class Filter:
+    column: str
+    op: str
+    value: object
+
+    def describe(self) -> str:
+        value = _fmt(self.value) if isinstance(self.value, float) else self.value
+        return f"{self.column} {self.op} {value}"
+
+
+@dataclass
+class Query:
+    operation: str
+    column: Optional[str] = None
+    group_by: Optional[str] = None
+    filters: List[Filter] = field(default_factory=list)
+
+
+class QueryPlanner:
+    """
+    Maps a question to filter + count/sum/mean/min/max (optionally grouped by a
+    column). Returns None for anything it does not recognise, so the caller can
+    fall back to the text path.
+    """
+
+    def plan(self, question: str, table: ListTable) -> Optional[Query]:
+        text = question.lower()
+        tokens = tokenize(text)
+        numeric = [c for c in table.columns.values() if c.kind == NUMERIC]
+        mentioned = [c for c in table.columns.values() if mentions(tokens, c.name)]
+        mentioned_numeric = [c for c in mentioned if c.kind == NUMERIC]
+
+        group_by = self._find_group_by(text, table)
+        filters = self._find_filters(text, tokens, table, group_by)
+        if filters is None:
+            # Условие, которое не удалось однозначно привязать к колонке: без него ответ был бы по всей таблице
+            return None
+        unknown = self._unresolved_words(tokens, table, filters)
+        if unknown:
+            # «Сколько посетителей в Лувре?» — слово «Лувре» ни на что не ссылается, считать по всей таблице нельзя
+            return None
+
+        if any(w in text for w in MEAN_WORDS):
+            operation = "mean"
+        elif any(w in text for w in MAX_WORDS):
+            operation = "max"
+        elif any(w in text for w in MIN_WORDS):
+            operation = "min"
+        elif any(w in text for w in SUM_WORDS) and mentioned_numeric:
+            operation = "sum"
+        elif any(w in text for w in COUNT_WORDS):
+            # «Сколько посетителей …» спрашивает про сумму числовой колонки, «сколько музеев …» — про число строк.
+            # Названная колонка важнее совпадения с названием списка; колонка, которая встречается только
+            # в условии («основано после 1900»), на это не влияет
+            compared = {f.column for f in filters if f.op != "="}
+            aggregated = [c for c in self._named_numeric(tokens, numeric) if c.name not in compared]
+            if len(aggregated) > 1:
+                return None
+            if aggregated:
+                return Query("sum", aggregated[0].name, group_by.name if group_by else None, filters)
+            operation = "count"
+        else:
+            return None
+
+        if operation == "count" and not filters and not group_by and not self._counts_rows(tokens, table):
+            # Голое «сколько …» без условий и без упоминания списка — скорее всего, вопрос не к таблице
+            return None
+
+        column = None
+        if operation != "count":
+            column = self._pick_numeric(text, tokens, mentioned_numeric, numeric, filters)
+            if column is None:
+                return None
+        return Query(operation, column.name if column else None, group_by.name if group_by else None, filters)
+
+    @staticmethod
+    def _unresolved_words(tokens: List[str], table: ListTable, filters: List[Filter]) -> List[str]:
+        """Words of the question that are not a keyword, a column, a filter value or the list itself"""
+        known = list(KEYWORD_WORDS) + list(table.common_words) + tokenize(table.name)
+        for column in table.columns.values():
+            known.extend(significant_words(column.name))
+        for f in filters:
+            if isinstance(f.value, str):
+                known.extend(tokenize(f.value))
+        stems = {stem(w) for w in known if len(w) > 1}
+        return [
+            t for t in tokens
+            if not t.isdigit() and t not in FUNCTION_WORDS and t not in NEGATIONS
+            and not any(t.startswith(s) for s in stems)
+        ]
+
+    @staticmethod
+    def _named_numeric(tokens: List[str], numeric: List[Column]) -> List[Column]:
+        """
+        Numeric columns the question names by their head word: «сколько посетителей» names
+        «Посетителей в год», while «основано» does not name «Год основания». Years and dates
+        are never summed, so «в 1900 году» does not turn a count into a sum of years
+        """
+        named = []
+        for column in numeric:
+            if _is_dated(column):
+                continue
+            words = significant_words(column.name)
+            if words and (mentions(tokens, column.name) or any(t.startswith(stem(words[0])) for t in tokens)):
+                named.append(column)
+        return named
+
+    @staticmethod
+    def _counts_rows(tokens: List[str], table: ListTable) -> bool:
+        """Question names the list itself ("сколько музеев"), not one of its numeric columns"""
+        name_words = [w for w in tokenize(table.name) if len(w) > 3]
+        return any(t.startswith(stem(w)) for w in name_words for t in tokens)
+
+    @staticmethod
+    def _pick_numeric(text: str, tokens: List[str], mentioned: List[Column], numeric: List[Column],
+                      filters: List[Filter]) -> Optional[Column]:
+        filtered = {f.column for f in filters if f.op != "="}
+        candidates = [c for c in mentioned if c.name not in filtered] or mentioned
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            return None
+
+        # Колонка названа частично: «основан раньше всех» -> «Год основания»
+        scored = sorted(((match_ratio(tokens, c.name), c) for c in numeric), key=lambda sc: sc[0], reverse=True)
+        if scored and scored[0][0] > 0 and (len(scored) == 1 or scored[0][0] > scored[1][0]):
+            return scored[0][1]
+        if any(w in text for w in ["раньше", "ранее", "поздн", "позже", "стар"]):
+            # «раньше всех» без названия колонки — колонка с годом или датой
+            dated = [c for c in numeric if _is_dated(c) or any(w in c.name.lower() for w in ["date", "year"])]
+            if len(dated) == 1:
+                return dated[0]
+        if len(numeric) == 1:
+            return numeric[0]
+        return None
+
+    @staticmethod
+    def _find_group_by(text: str, table: ListTable) -> Optional[Column]:
+        for match in re.finditer(GROUP_PATTERN, text):
+            word = match.group(1)
+            for column in table.columns.values():
+                if column.kind != NUMERIC and mentions([word], column.name):
+                    return column
+        return None
+
+    def _find_filters(self, text: str, tokens: List[str], table: ListTable,
+                      group_by: Optional[Column]) -> Optional[List[Filter]]:
+        """Filters named in the question; None if a numeric comparison cannot be tied to a column"""
+        filters = []
+        for column in table.columns.values():
+            if column is group_by:
+                continue
+            if column.kind == TEXT:
+                distinct = table.distinct(column)
+                if len(distinct) > max(50, table.size // 2):
+                    continue
+                matches = [v for v in distinct if mentions(tokens, v)]
+                if len(matches) > 1:
+                    # «в Париже и Лондоне», «в Москве или Каире»: несколько значений пока не поддерживаем
+                    return None
+                if matches:
+                    if self._is_negated(tokens, matches[0]):
+                        # «не в Париже», «кроме Лондона»
+                        return None
+                    filters.append(Filter(column.name, "=", matches[0]))
+            elif column.kind == BOOL and mentions(tokens, column.name):
+                negated = re.search(r"\b(не|без)\s+" + re.escape(stem(tokenize(column.name)[0])), text)
+                filters.append(Filter(column.name, "=", not negated))
+
+        comparisons = self._find_comparisons(text, table)
+        if comparisons is None:
+            return None
+        return filters + comparisons
+
+    @staticmethod
+    def _is_negated(tokens: List[str], value: str) -> bool:
+        """A negation within two words before the first word of the value"""
+        first = stem(significant_words(value)[0]) if significant_words(value) else value
+        for i, token in enumerate(tokens):
+            if token.startswith(first) and NEGATIONS.intersection(tokens[max(0, i - 2):i]):
+                return True
+        return False
+
+    def _find_comparisons(self, text: str, table: ListTable) -> Optional[List[Filter]]:
+        numeric = [c for c in table.columns.values() if c.kind == NUMERIC]
+        filters = []
+
+        # «от 1800 до 1900» — один диапазон по одной колонке, а не два независимых сравнения
+        for match in re.finditer(rf"\bот\s+{NUMBER_PATTERN}\s+до\s+{NUMBER_PATTERN}", text):
+            low, high = _match_number(match, 1), _match_number(match, 3)
+            column = self._comparison_column(text[:match.start()], numeric, (low, high), text[match.end():])
+            if column is None:
+                return None
+            filters += [Filter(column.name, ">=", low), Filter(column.name, "<=", high)]
+        text = re.sub(rf"\bот\s+{NUMBER_PATTERN}\s+до\s+{NUMBER_PATTERN}", " ", text)
+
+        words = "|".join(GT_WORDS + LT_WORDS)
+        for match in re.finditer(rf"\b({words})\s+(?:чем\s+)?{NUMBER_PATTERN}", text):
+            op = ">" if match.group(1) in GT_WORDS else "<"
+            value = _match_number(match, 2)
+            column = self._comparison_column(text[:match.start()], numeric, (value,), text[match.end():])
+            if column is None:
+                return None
+            filters.append(Filter(column.name, op, value))
+
+        # Число вне сравнения («в 1900 году», «в зале 5») поставить в запрос нельзя
+        if re.search(r"\d", re.sub(rf"\b({words})\s+(?:чем\s+)?{NUMBER_PATTERN}", " ", text)):
+            return None
+        return filters
+
+    def _comparison_column(self, prefix: str, numeric: List[Column], values: Tuple[float, ...],
+                           suffix: str) -> Optional[Column]:
+        """Column a compared number refers to; None for times of day («до 18:00») and unnamed columns"""
+        if re.match(r"[:.]\d", suffix):
+            return None
+        column = self._nearest_numeric(prefix, numeric) or (numeric[0] if len(numeric) == 1 else None)
+        is_year = all(1000 <= v <= 2100 for v in values)
+        if column is None and is_year:
+            dated = [c for c in numeric if _is_dated(c)]
+            column = dated[0] if len(dated) == 1 else None
+        if column is not None and _is_dated(column) and not is_year:
+            # «основано более 100 лет назад» — это не год основания > 100
+            return None
+        return column
+
+    @staticmethod
+    def _nearest_numeric(prefix: str, numeric: List[Column]) -> Optional[Column]:
+        """Numeric column best named in the few words right before a comparison"""
+        tokens = tokenize(prefix)[-6:]
+        scored = sorted(((match_ratio(tokens, c.name), c) for c in numeric), key=lambda sc: sc[0], reverse=True)
+        if scored and scored[0][0] > 0 and (len(scored) == 1 or scored[0][0] > scored[1][0]):
+            return scored[0][1]
+        return None
+
+
+@dataclass
+class QueryResult:
+    query: Query
+    table_name: str
+    rows_matched: int
+    value: Optional[float] = None
+    groups: Optional[List[Tuple[str, float]]] = None
+    examples: List[Dict] = field(default_factory=list)
+
+    def describe(self) -> str:
+        """Short text for the LLM to put into words"""
+        labels = {"count": "Количество записей", "sum": "Сумма", "mean": "Среднее",
+                  "min": "Минимум", "max": "Максимум"}
+        subject = labels[self.query.operation]
+        if self.query.column:
+            subject += f" по колонке «{self.query.column}»"
+        conditions = ", ".join(f.describe() for f in self.query.filters)
+        lines = [f"Таблица «{self.table_name}». {subject}" + (f" при условии {conditions}" if conditions else "") + "."]
+        if self.groups is not None:
+            lines.append(f"В разрезе «{self.query.group_by}»:")
+            lines.extend(f"• {name}: {_fmt(value)}" for name, value in self.groups)
+        else:
+            lines.append(f"Результат: {_fmt(self.value)} (подходящих записей: {self.rows_matched}).")
+        if self.examples:
+            lines.append("Записи с этим значением:")
+            lines.extend(f"• {orjson.dumps(row).decode()}" for row in self.examples)
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        return {
+            "operation": self.query.operation,
+            "column": self.query.column,
+            "group_by": self.query.group_by,
+            "filters": [f.__dict__ for f in self.query.filters],
+            "rows_matched": self.rows_matched,
+            "value": self.value,
+            "groups": self.groups,
+        }
+
+
+def _is_dated(column: Column) -> bool:
+    """«Год основания», «Дата открытия» — но не «Посетителей в год»"""
+    words = significant_words(column.name)
+    return bool(words) and words[0].startswith(("год", "дат"))
+
+
+def _match_number(match: re.Match, group: int) -> float:
+    """Number captured by NUMBER_PATTERN at group, with its «тыс»/«млн» multiplier applied"""
+    value = float(match.group(group).replace(" ", "").replace(",", "."))
+    if match.group(group + 1):
+        value *= next(m for k, m in MULTIPLIERS.items() if match.group(group + 1).startswith(k))
+    return value
+
+
+def _fmt(value: Optional[float]) -> str:
+    if value is None:
+        return "нет данных"
+    return str(int(value)) if float(value).is_integer() else f"{value:.2f}"
+
+
+class ListQueryEngine:
+    """Answers aggregate questions over lists directly, keeping recent lists in columnar form"""
+
+    def __init__(self, max_tables: int = 256):
+        self.planner = QueryPlanner()
+        self.max_tables = max_tables
+        self._tables: "OrderedDict[str, Tuple[str, ListTable]]" = OrderedDict()
+
+    def get_table(self, list_id: str, name: str, rows: List[Dict]) -> ListTable:
+        digest = hashlib.md5(orjson.dumps(rows, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        cached = self._tables.get(list_id)
+        if cached and cached[0] == digest:
+            self._tables.move_to_end(list_id)
+            return cached[1]
+
+        table = ListTable(name, rows)
+        self._tables[list_id] = (digest, table)
+        self._tables.move_to_end(list_id)
+        while len(self._tables) > self.max_tables:
+            self._tables.popitem(last=False)
+        return table
+
+    def answer(self, list_id: str, name: str, rows: List[Dict], question: str) -> Optional[QueryResult]:
+        rows = [row for row in rows if isinstance(row, dict)]
+        if not rows:
+            return None
+        table = self.get_table(list_id, name, rows)
+        query = self.planner.plan(question, table)
+        if query is None:
+            return None
+        return self.execute(table, query, rows)
+
+    def execute(self, table: ListTable, query: Query, rows: List[Dict]) -> QueryResult:
+        mask = np.ones(table.size, dtype=bool)
+        for f in query.filters:
+            column = table.columns[f.column]
+            if f.op == "=":
+                mask &= column.present & (column.values == f.value)
+            elif f.op == ">":
+                mask &= column.present & (column.values > f.value)
+            elif f.op == ">=":
+                mask &= column.present & (column.values >= f.value)
+            elif f.op == "<=":
+                mask &= column.present & (column.values <= f.value)
+            else:
+                mask &= column.present & (column.values < f.value)
+
+        values = None
+        if query.column:
+            column = table.columns[query.column]
+            mask &= column.present
+            values = column.values
+        result = QueryResult(query, table.name, int(mask.sum()))
+
+        if query.group_by:
+            keys = table.columns[query.group_by]
+            mask &= keys.present
+            names, inverse = np.unique(keys.values[mask], return_inverse=True)
+            result.groups = [(str(n), v) for n, v in zip(names, self._aggregate_groups(query.operation, inverse, values, mask, len(names)))]
+            result.groups.sort(key=lambda g: g[1], reverse=True)
+            return result
+
+        if query.operation == "count":
+            result.value = float(mask.sum())
+        elif mask.any():
+            selected = values[mask]
+            result.value = float({"sum": np.sum, "mean": np.mean, "min": np.min, "max": np.max}[query.operation](selected))
+            if query.operation in ("min", "max"):
+                hits = np.flatnonzero(mask & (values == result.value))
+                result.examples = [rows[i] for i in hits[:5]]
+        return result
+
+    @staticmethod
+    def _aggregate_groups(operation: str, inverse: np.ndarray, values: Optional[np.ndarray],
+                          mask: np.ndarray, size: int) -> List[float]:
+        counts = np.bincount(inverse, minlength=size).astype(float)
+        if operation == "count":
+            return counts.tolist()
+        selected = values[mask]
+        if operation in ("sum", "mean"):
+            sums = np.bincount(inverse, weights=selected, minlength=size)
+            return (sums if operation == "sum" else sums / counts).tolist()
+        result = np.full(size, -np.inf if operation == "max" else np.inf)
+        (np.maximum if operation == "max" else np.minimum).at(result, inverse, selected)
+        return result.tolist()
@@ -1,5 +1,6 @@
 import os
 import asyncio
+from typing import Optional
 from dotenv import load_dotenv
 from langchain_community.llms import Ollama
 from langchain.chains import LLMChain
@@ -8,6 +9,9 @@ from langchain.prompts import PromptTemplate
 # Загрузка переменных окружения
 load_dotenv()
 
+# Ответ модели, когда кратких содержаний не хватает для ответа
+NO_ANSWER = "НЕТ ОТВЕТА"
+
 class LLMProcessor:
     def __init__(self):
         ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
@@ -38,10 +42,62 @@ class LLMProcessor:
             prompt=self.prompt_template
         )
 
+        self.summary_template = PromptTemplate(
+            template="""
+            Кратко перескажи текст, сохранив названия, числа, даты и перечисления.
+            Не добавляй ничего, чего нет в тексте.
+            
+            Текст:
+            {data}
+            
+            Краткое содержание:
+            """,
+            input_variables=["data"]
+        )
+
+        self.summary_chain = LLMChain(
+            llm=self.llm,
+            prompt=self.summary_template
+        )
+
+        self.summary_answer_template = PromptTemplate(
+            template="""
+            Ответь на вопрос по кратким содержаниям разделов сайта. Используй только эти данные.
+            Если ответа в них нет или он требует подробностей, которых в них нет, ответь ровно: {no_answer}
+            
+            Краткие содержания:
+            {data}
+            
+            Вопрос: {question}
+            
+            Ответ:
+            """,
+            input_variables=["data", "question"],
+            partial_variables={"no_answer": NO_ANSWER}
+        )
+
+        self.summary_answer_chain = LLMChain(
+            llm=self.llm,
+            prompt=self.summary_answer_template
+        )
+
+    async def process_summary_query(self, data: str, question: str) -> Optional[str]:
+        """Ответ только по кратким содержаниям; None, если в них нет ответа"""
+        answer = await self.summary_answer_chain.arun(data=data, question=question)
+        return None if NO_ANSWER in answer.upper() else answer
+
     async def process_query(self, data: str, question: str) -> str:
-        """Асинхронная обработка запроса через LLM"""
+        """
+        Асинхронная обработка запроса через LLM. Вызов идёт по HTTP без пула потоков,
+        поэтому отмена (например, по сроку запроса) закрывает соединение и Ollama
+        прекращает генерацию
+        """
+        return await self.chain.arun(data=data, question=question)
+
+    async def summarize(self, data: str, executor=None) -> str:
+        """Краткое содержание текста; executor позволяет вынести фоновые задачи в отдельный пул"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
-            None,
-            lambda: self.chain.run(data=data, question=question)
+            executor,
+            lambda: self.summary_chain.run(data=data)
         )
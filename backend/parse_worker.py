@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from io import BytesIO
+from typing import Optional
+
+import orjson
+import redis
+from dotenv import load_dotenv
+from unstructured.partition.auto import partition
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+QUEUE_KEY = "parse:jobs"
+ATTEMPTS_KEY = "parse:attempts"
+MAX_ATTEMPTS = int(os.getenv("PARSE_MAX_ATTEMPTS", "3"))
+JOB_TTL = int(os.getenv("PARSE_JOB_TTL", "600"))
+RESULT_TTL = int(os.getenv("PARSE_RESULT_TTL", "86400"))
+
+
+def _blob_key(digest: str) -> str:
+    return f"parse:blob:{digest}"
+
+
+def _result_key(digest: str) -> str:
+    return f"parse:result:{digest}"
+
+
+def _inflight_key(digest: str) -> str:
+    return f"parse:inflight:{digest}"
+
+
+def _done_channel(digest: str) -> str:
+    return f"parse:done:{digest}"
+
+
+def _processing_key(worker_id: int) -> str:
+    return f"parse:processing:{worker_id}"
+
+
+def parse_file_content(data: bytes) -> str:
+    """Extract text from a file with unstructured; empty string if it cannot be parsed"""
+    try:
+        elements = partition(file=BytesIO(data))
+        return "\n".join([str(el) for el in elements])
+    except Exception as e:
+        logger.error(f"Content parsing error: {e}")
+        return ""
+
+
+class ParseClient:
+    """
+    Submits parse jobs to the shared worker service and waits for results.
+
+    Jobs are keyed by the SHA-256 of the file bytes: a finished result is
+    reused, and a job already queued or running is awaited rather than
+    submitted again, whichever API process asked first. If the job
+    disappears without a result (dropped by a worker, or its in-flight
+    marker expired), the waiting client submits it again.
+    """
+
+    def __init__(self, redis_client, timeout: Optional[float] = None):
+        self.redis = redis_client
+        self.timeout = timeout or float(os.getenv("PARSE_TIMEOUT", "120"))
+
+    async def parse(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        result = await self.redis.get(_result_key(digest))
+        if result is not None:
+            return orjson.loads(result)
+
+        # Subscribe before submitting so the completion message cannot be missed
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(_done_channel(digest))
+        try:
+            deadline = time.monotonic() + self.timeout
+            while time.monotonic() < deadline:
+                result = await self.redis.get(_result_key(digest))
+                if result is not None:
+                    return orjson.loads(result)
+                await self._submit(digest, data)
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            raise TimeoutError(f"Parse job {digest} did not finish in {self.timeout}s")
+        finally:
+            await pubsub.reset()
+
+    async def _submit(self, digest: str, data: bytes) -> None:
+        """Queue the job unless another client already has it in flight"""
+        if await self.redis.set(_inflight_key(digest), 1, nx=True, ex=JOB_TTL):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.setex(_blob_key(digest), JOB_TTL, data)
+                pipe.lpush(QUEUE_KEY, digest)
+                await pipe.execute()
+
+
+def _requeue_unfinished(client, worker_id: int) -> None:
+    """
+    Jobs a previous run of this worker took but did not finish go back to the
+    queue. A file that keeps killing its worker (segfault, OOM) is given up
+    after PARSE_MAX_ATTEMPTS and finished with an empty result, like any other
+    file that cannot be parsed.
+    """
+    processing = _processing_key(worker_id)
+    while True:
+        digest = client.lindex(processing, -1)
+        if digest is None:
+            return
+        digest = digest.decode()
+        attempts = client.hincrby(ATTEMPTS_KEY, digest, 1)
+        client.expire(ATTEMPTS_KEY, JOB_TTL)
+        if attempts < MAX_ATTEMPTS:
+            logger.warning(f"Parse worker {worker_id}: requeued unfinished job {digest} (attempt {attempts + 1})")
+            client.lmove(processing, QUEUE_KEY, "RIGHT", "RIGHT")
+            continue
+
+        logger.error(f"Parse job {digest} crashed a worker {attempts} times, giving up")
+        _finish(client, processing, digest, "")
+
+
+def _finish(client, processing: str, digest: str, content: str) -> None:
+    """Store the result, release the job and wake up the waiting clients"""
+    with client.pipeline(transaction=True) as pipe:
+        pipe.setex(_result_key(digest), RESULT_TTL, orjson.dumps(content))
+        pipe.delete(_blob_key(digest), _inflight_key(digest))
+        pipe.hdel(ATTEMPTS_KEY, digest)
+        pipe.publish(_done_channel(digest), b"1")
+        pipe.lrem(processing, 1, digest)
+        pipe.execute()
+
+
+def run_worker(worker_id: int, redis_config: dict) -> None:
+    """
+    Take jobs from the queue one at a time until the process is stopped.
+    A job stays in this worker's processing list until it is finished, so a
+    worker that dies mid-partition gets it back when it is restarted.
+    """
+    client = redis.Redis(**redis_config)
+    processing = _processing_key(worker_id)
+    _requeue_unfinished(client, worker_id)
+    logger.info(f"Parse worker {worker_id} started")
+    while True:
+        job = client.blmove(QUEUE_KEY, processing, timeout=5, src="RIGHT", dest="LEFT")
+        if not job:
+            continue
+        digest = job.decode()
+        data = client.get(_blob_key(digest))
+        if data is None:
+            # The blob expired: tell waiting clients, they still have the bytes and resubmit
+            logger.warning(f"Parse job {digest} has no data, dropping")
+            with client.pipeline(transaction=True) as pipe:
+                pipe.delete(_inflight_key(digest))
+                pipe.publish(_done_channel(digest), b"0")
+                pipe.lrem(processing, 1, digest)
+                pipe.execute()
+            continue
+
+        started = time.perf_counter()
+        content = parse_file_content(data)
+        _finish(client, processing, digest, content)
+        logger.info(f"Parse worker {worker_id}: {digest[:12]} ({len(data)} bytes) in {time.perf_counter() - started:.2f}s")
+
+
+def main() -> None:
+    """Start PARSE_WORKERS worker processes; this is the only place on the host that runs partition"""
+    redis_config = {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", "6379")),
+        "db": int(os.getenv("REDIS_DB", "0"))
+    }
+    workers = {}
+    try:
+        while True:
+            # A dead worker is replaced under the same id and requeues the job it was processing
+            for i in range(int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))):
+                worker = workers.get(i)
+                if worker is None or not worker.is_alive():
+                    if worker is not None:
+                        logger.error(f"Parse worker {i} exited with code {worker.exitcode}, restarting")
+                    worker = multiprocessing.Process(target=run_worker, args=(i, redis_config), daemon=True)
+                    worker.start()
+                    workers[i] = worker
+            time.sleep(5)
+    except KeyboardInterrupt:
+        for worker in workers.values():
+            worker.terminate()
+
+if __name__ == "__main__":
+    main()
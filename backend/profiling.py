@@ -0,0 +1,141 @@
+import contextvars
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Duration of one request; when profiled, also a timeline of spans and optionally a cProfile dump"""
+
+    def __init__(self, name: str, attrs: Dict, profiled: bool = True, use_cprofile: bool = False):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.profiled = profiled
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.cprofile = cProfile.Profile() if use_cprofile else None
+        self.duration_ms: Optional[float] = None
+        self.cprofile_stats: Optional[str] = None
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        start = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            record = {
+                "name": name,
+                "start_ms": round((start - self.started) * 1000, 2),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            if attrs:
+                record["attrs"] = attrs
+            if error:
+                record["error"] = error
+            self.spans.append(record)
+
+    def summary(self) -> Dict:
+        """Total time per span name, largest first"""
+        totals: Dict[str, Dict] = {}
+        for s in self.spans:
+            total = totals.setdefault(s["name"], {"count": 0, "total_ms": 0.0})
+            total["count"] += 1
+            total["total_ms"] = round(total["total_ms"] + s["duration_ms"], 2)
+        return dict(sorted(totals.items(), key=lambda kv: kv[1]["total_ms"], reverse=True))
+
+    def to_dict(self) -> Dict:
+        result = {
+            "id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "profiled": self.profiled,
+        }
+        if self.profiled:
+            result["summary"] = self.summary()
+            result["spans"] = sorted(self.spans, key=lambda s: s["start_ms"])
+        if self.cprofile_stats:
+            result["cprofile"] = self.cprofile_stats
+        return result
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a span in the current request profile; no-op when the request is not profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield attrs
+        return
+    with profile.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+class Profiler:
+    """
+    Opt-in request profiling.
+
+    A request is profiled when the client asks for it (X-Profile header) or
+    when it is picked by PROFILE_SAMPLE_RATE. Every request is timed, and any
+    request slower than PROFILE_SLOW_MS is kept in a bounded ring buffer for
+    the admin endpoint, with its spans if it was profiled.
+    """
+
+    def __init__(self):
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.slow_ms = float(os.getenv("PROFILE_SLOW_MS", "5000"))
+        self.slow_requests = deque(maxlen=int(os.getenv("PROFILE_BUFFER_SIZE", "50")))
+        # cProfile hooks the whole event loop thread, so only one request at a time may use it
+        self._cprofile_busy = False
+
+    def start(self, name: str, header: Optional[str], **attrs) -> RequestProfile:
+        mode = (header or "").strip().lower()
+        if mode in ("", "0", "off", "false"):
+            sampled = self.sample_rate and random.random() < self.sample_rate
+            mode = "spans" if sampled else None
+
+        use_cprofile = mode == "cprofile" and not self._cprofile_busy
+        profile = RequestProfile(name, attrs, mode is not None, use_cprofile)
+        if profile.profiled:
+            _current_profile.set(profile)
+        if profile.cprofile:
+            self._cprofile_busy = True
+            profile.cprofile.enable()
+        return profile
+
+    def finish(self, profile: RequestProfile) -> None:
+        profile.duration_ms = round((time.perf_counter() - profile.started) * 1000, 2)
+        if profile.cprofile:
+            profile.cprofile.disable()
+            self._cprofile_busy = False
+            out = io.StringIO()
+            pstats.Stats(profile.cprofile, stream=out).sort_stats("cumulative").print_stats(40)
+            profile.cprofile_stats = out.getvalue()
+            profile.cprofile = None
+
+        if profile.duration_ms >= self.slow_ms:
+            self.slow_requests.append(profile.to_dict())
+            top_spans = list(profile.summary().items())[:3] if profile.profiled else "not profiled"
+            logger.warning(f"Slow request {profile.id} ({profile.name}): {profile.duration_ms}ms, "
+                           f"top spans: {top_spans}")
+
+    def get_slow_requests(self, limit: int) -> List[Dict]:
+        return list(self.slow_requests)[-limit:][::-1]
@@ -4,8 +4,6 @@ import asyncpg
 from bs4 import BeautifulSoup
 import aiohttp
 import aiofiles
-from io import BytesIO
-from unstructured.partition.auto import partition
 import json
 from datetime import datetime
 from typing import List, Dict, Optional, AsyncGenerator
@@ -16,6 +14,11 @@ import redis.asyncio as aioredis
 import orjson
 import asyncio
 import logging
+import time
+from contextlib import aclosing
+from profiling import span
+from parse_worker import ParseClient, parse_file_content
+from deadline import CostEstimator, Deadline
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -59,13 +62,27 @@ class SiteSearchEngine:
             "db": int(os.getenv("REDIS_DB", "0"))
         }
 
+        self.media_base_url = os.getenv("MEDIA_BASE_URL", "https://hackaton.hb.ru-msk.vkcloud-storage.ru/media/")
         self.cache_dir = "file_cache"
         self.cache_ttl = cache_ttl
         self.redis = aioredis.Redis(**self.redis_config)
         self.executor = ThreadPoolExecutor(max_workers=int(os.getenv("THREAD_WORKERS", "8")))
-        self.process_executor = ProcessPoolExecutor(max_workers=int(os.getenv("PROCESS_WORKERS", "4")))
+        # PARSE_BACKEND=service hands file parsing to the shared parse_worker.py service
+        # instead of a per-process pool, so several API workers do not oversubscribe the host
+        self.parse_client = None
+        self.process_executor = None
+        if os.getenv("PARSE_BACKEND", "local") == "service":
+            self.parse_client = ParseClient(self.redis)
+        else:
+            self.process_executor = ProcessPoolExecutor(max_workers=int(os.getenv("PROCESS_WORKERS", "4")))
         os.makedirs(self.cache_dir, exist_ok=True)
-        
+
+        # Seconds per MB of uncached file (download + parse), learned from observed files
+        self.costs = CostEstimator({"file": float(os.getenv("FILE_COST_PER_MB", "2.0"))})
+        self._file_tasks: Dict[str, asyncio.Task] = {}
+        self._warm_tasks: Dict[str, asyncio.Task] = {}
+        self._warm_slots = asyncio.Semaphore(int(os.getenv("WARM_CONCURRENCY", "2")))
+
         self.pools = {}
 
     async def initialize(self):
@@ -104,29 +121,76 @@ class SiteSearchEngine:
         finally:
             await self._release_connection(conn, "cms")
 
-    async def get_site_content(self, site_name: str) -> AsyncGenerator[Dict, None]:
-        site_id = await self._get_site_id_by_name(site_name)
+    async def get_site_content(
+        self,
+        site_name: str,
+        deadline: Optional[Deadline] = None,
+        skipped: Optional[List[Dict]] = None
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Stream site content. With a deadline, slow sources that would miss it
+        are left out and described in `skipped`; their files keep loading in
+        the background so the next request finds them cached.
+        """
+        deadline = deadline or Deadline(None)
+        skipped = skipped if skipped is not None else []
+
+        with span("site_lookup", site=site_name):
+            site_id = await self._get_site_id_by_name(site_name)
         if not site_id:
             raise ValueError(f"Site {site_name} not found or not published")
 
-        pages_gen = self._stream_pages_content(site_id)
-        files_gen = self._stream_files_content(site_id)
-        lists_gen = self._stream_lists_content(site_id)
+        generators = {
+            ContentType.HTML.value: self._stream_pages_content(site_id),
+            ContentType.FILE.value: self._stream_files_content(site_id, deadline, skipped),
+            ContentType.LIST.value: self._stream_lists_content(site_id),
+        }
+
+        async with aclosing(self._priority_merge_generators(generators, deadline, skipped)) as items:
+            async for item in items:
+                yield item
 
-        async for item in self._priority_merge_generators(pages_gen, files_gen, lists_gen):
+    async def get_site_lists(self, site_name: str) -> AsyncGenerator[Dict, None]:
+        """Only the lists of a site, with their rows"""
+        site_id = await self._get_site_id_by_name(site_name)
+        if not site_id:
+            raise ValueError(f"Site {site_name} not found or not published")
+        async for item in self._stream_lists_content(site_id):
             yield item
 
-    async def _priority_merge_generators(self, *generators) -> AsyncGenerator:
-        tasks = {i: asyncio.create_task(gen.__anext__()) for i, gen in enumerate(generators)}
-        while tasks:
-            done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
-            for idx, task in list(tasks.items()):
-                if task in done:
-                    try:
-                        yield task.result()
-                        tasks[idx] = asyncio.create_task(generators[idx].__anext__())
-                    except StopAsyncIteration:
-                        del tasks[idx]
+    async def _priority_merge_generators(
+        self,
+        generators: Dict[str, AsyncGenerator],
+        deadline: Deadline,
+        skipped: List[Dict]
+    ) -> AsyncGenerator:
+        tasks = {name: asyncio.create_task(gen.__anext__()) for name, gen in generators.items()}
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks.values(),
+                    timeout=None if deadline.expires is None else deadline.remaining(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    return
+                for name, task in list(tasks.items()):
+                    if task in done:
+                        try:
+                            yield task.result()
+                            tasks[name] = asyncio.create_task(generators[name].__anext__())
+                        except StopAsyncIteration:
+                            del tasks[name]
+        finally:
+            # Sources still producing when the deadline hit (or the consumer stopped early)
+            if deadline.expired:
+                for name in tasks:
+                    skipped.append({"type": name, "reason": "deadline"})
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            for gen in generators.values():
+                await gen.aclose()
 
     async def _stream_pages_content(self, site_id: str) -> AsyncGenerator[Dict, None]:
         query = """
@@ -141,9 +205,14 @@ class SiteSearchEngine:
         conn = await self._get_connection("cms")
         try:
             async with conn.transaction():
-                cursor = conn.cursor(query, site_id)
-                async for batch in cursor.iter(50):  # Fetch in batches of 50
-                    processed = await self._process_pages_batch(batch)
+                cursor = await conn.cursor(query, site_id)
+                while True:
+                    with span("pages_query"):
+                        batch = await cursor.fetch(50)  # Fetch in batches of 50
+                    if not batch:
+                        break
+                    with span("html_parse", pages=len(batch)):
+                        processed = await self._process_pages_batch(batch)
                     for item in processed:
                         if item:
                             yield item
@@ -189,8 +258,14 @@ class SiteSearchEngine:
             logger.error(f"HTML parsing error: {e}")
             return None
 
-    async def _stream_files_content(self, site_id: str) -> AsyncGenerator[Dict, None]:
-        root_folder_id = await self._get_root_folder_id(site_id)
+    async def _stream_files_content(
+        self,
+        site_id: str,
+        deadline: Deadline,
+        skipped: List[Dict]
+    ) -> AsyncGenerator[Dict, None]:
+        with span("files_root_folder"):
+            root_folder_id = await self._get_root_folder_id(site_id)
         if not root_folder_id:
             return
 
@@ -201,35 +276,120 @@ class SiteSearchEngine:
                 SELECT so.id FROM storage_storageobject so
                 JOIN folder_tree ft ON so.parent_id = ft.id
             )
-            SELECT so.id, so.name, sv.link as file_link
+            SELECT so.id, so.name, so.size, sv.link as file_link
             FROM folder_tree ft
             JOIN storage_storageobject so ON ft.id = so.id
             JOIN storage_version sv ON so.id = sv.storage_object_id
             WHERE so.type = 1
             ORDER BY sv.created_at DESC
         """
+        # The file list is small; fetch it up front so the connection is not held during downloads
         conn = await self._get_connection("filestorage")
         try:
-            async with conn.transaction():
-                cursor = conn.cursor(query, root_folder_id)
-                async for row in cursor:
-                    try:
-                        content = await self._process_file(row['file_link'])
-                        if content:
-                            yield {
-                                "content": content,
-                                "metadata": {
-                                    "id": row['id'],
-                                    "name": row['name'],
-                                    "type": ContentType.FILE.value,
-                                    "url": row['file_link']
-                                }
-                            }
-                    except Exception as e:
-                        logger.error(f"Error processing file {row.get('id')}: {e}")
+            with span("files_cte") as attrs:
+                rows = await conn.fetch(query, root_folder_id)
+                attrs["files"] = len(rows)
         finally:
             await self._release_connection(conn, "filestorage")
 
+        # Under a deadline, cheapest first: cached files, then by expected download + parse time
+        if deadline.expires is None:
+            files = [(0.0, row) for row in rows]
+        else:
+            files = sorted(
+                [(await self._expected_file_cost(row), row) for row in rows],
+                key=lambda f: f[0]
+            )
+
+        for cost, row in files:
+            file_info = {
+                "id": row['id'],
+                "name": row['name'],
+                "type": ContentType.FILE.value,
+                "url": row['file_link']
+            }
+            if not deadline.allows(cost):
+                self._warm_file(row['file_link'], row['size'])
+                skipped.append({**file_info, "reason": "deadline"})
+                continue
+
+            task = self._get_file_task(row['file_link'], row['size'])
+            try:
+                if deadline.expires is None:
+                    content = await task
+                else:
+                    # shield: on timeout the download keeps going and warms the cache
+                    content = await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+            except asyncio.TimeoutError:
+                skipped.append({**file_info, "reason": "timeout"})
+                continue
+            except Exception as e:
+                logger.error(f"Error processing file {row.get('id')}: {e}")
+                content = None
+
+            if content is None:
+                # Download or parse failed this time; the file itself is still listed
+                skipped.append({**file_info, "reason": "error"})
+            elif content:
+                yield {
+                    "content": content,
+                    "metadata": file_info
+                }
+
+    async def _is_file_cached(self, file_url: str) -> bool:
+        cache_key = f"file:{hashlib.md5(file_url.encode()).hexdigest()}"
+        local_cache_file = os.path.join(self.cache_dir, f"{file_url.replace('/', '_')}.json")
+        return bool(await self.redis.exists(cache_key)) or os.path.exists(local_cache_file)
+
+    @staticmethod
+    def _file_units(size: Optional[int]) -> float:
+        return (size or 0) / (1024 * 1024) + 0.1
+
+    async def _expected_file_cost(self, row) -> float:
+        if row['file_link'] in self._file_tasks or await self._is_file_cached(row['file_link']):
+            return 0.0
+        return self.costs.expected("file", self._file_units(row['size']))
+
+    def _get_file_task(self, file_url: str, size: Optional[int]) -> asyncio.Task:
+        """One load per file in flight, shared by concurrent requests and background warming"""
+        task = self._file_tasks.get(file_url)
+        if task is None:
+            task = asyncio.create_task(self._load_file(file_url, size))
+            self._file_tasks[file_url] = task
+            task.add_done_callback(lambda _: self._file_tasks.pop(file_url, None))
+        return task
+
+    def _warm_file(self, file_url: str, size: Optional[int]) -> None:
+        """
+        Load a skipped file in the background. Only warming waits for
+        WARM_CONCURRENCY slots; a request that needs the file meanwhile starts
+        the load itself instead of queueing behind them.
+        """
+        if file_url in self._file_tasks or file_url in self._warm_tasks:
+            return
+        task = asyncio.create_task(self._warm(file_url, size))
+        self._warm_tasks[file_url] = task
+        task.add_done_callback(lambda _: self._warm_tasks.pop(file_url, None))
+
+    async def _warm(self, file_url: str, size: Optional[int]) -> None:
+        async with self._warm_slots:
+            if file_url in self._file_tasks or await self._is_file_cached(file_url):
+                return
+            try:
+                await self._get_file_task(file_url, size)
+            except Exception as e:
+                logger.error(f"Background load failed for {file_url}: {e}")
+
+    async def _load_file(self, file_url: str, size: Optional[int]) -> Optional[str]:
+        if await self._is_file_cached(file_url):
+            return await self._process_file(file_url)
+
+        started = time.perf_counter()
+        content = await self._process_file(file_url)
+        if content is not None:
+            self.costs.observe("file", time.perf_counter() - started, self._file_units(size))
+        return content
+
     async def _get_root_folder_id(self, site_id: str) -> Optional[str]:
         conn = await self._get_connection("cms")
         try:
@@ -243,30 +403,30 @@ class SiteSearchEngine:
 
     async def _process_file(self, file_url: str) -> Optional[str]:
         cache_key = f"file:{hashlib.md5(file_url.encode()).hexdigest()}"
-        cached = await self.redis.get(cache_key)
+        with span("file_cache_lookup", url=file_url) as attrs:
+            cached = await self.redis.get(cache_key)
+            attrs["hit"] = "redis" if cached else "miss"
         if cached:
             return orjson.loads(cached)
 
         local_cache_file = os.path.join(self.cache_dir, f"{file_url.replace('/', '_')}.json")
         if os.path.exists(local_cache_file):
-            async with aiofiles.open(local_cache_file, 'r') as f:
-                content = await f.read()
-                await self.redis.setex(cache_key, self.cache_ttl, content)
-                return orjson.loads(content)
+            with span("file_cache_lookup", url=file_url, hit="disk"):
+                async with aiofiles.open(local_cache_file, 'r') as f:
+                    content = await f.read()
+                    await self.redis.setex(cache_key, self.cache_ttl, content)
+            return orjson.loads(content)
 
         try:
-            base_url = "https://hackaton.hb.ru-msk.vkcloud-storage.ru/media/"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(base_url + file_url, timeout=30) as response:
-                    response.raise_for_status()
-                    file_content = await response.read()
-
-            loop = asyncio.get_event_loop()
-            content = await loop.run_in_executor(
-                self.process_executor,
-                self._parse_file_content,
-                BytesIO(file_content)
-            )
+            with span("file_download", url=file_url) as attrs:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(self.media_base_url + file_url, timeout=30) as response:
+                        response.raise_for_status()
+                        file_content = await response.read()
+                attrs["bytes"] = len(file_content)
+
+            with span("file_partition", url=file_url):
+                content = await self._parse_file_content(file_content)
 
             await self.redis.setex(cache_key, self.cache_ttl, orjson.dumps(content))
             async with aiofiles.open(local_cache_file, 'wb') as f:
@@ -277,13 +437,11 @@ class SiteSearchEngine:
             logger.error(f"File processing error for {file_url}: {e}")
             return None
 
-    def _parse_file_content(self, file_obj: BytesIO) -> str:
-        try:
-            elements = partition(file=file_obj)
-            return "\n".join([str(el) for el in elements])
-        except Exception as e:
-            logger.error(f"Content parsing error: {e}")
-            return ""
+    async def _parse_file_content(self, file_content: bytes) -> str:
+        if self.parse_client:
+            return await self.parse_client.parse(file_content)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.process_executor, parse_file_content, file_content)
 
     async def _stream_lists_content(self, site_id: str) -> AsyncGenerator[Dict, None]:
         query = """
@@ -297,18 +455,29 @@ class SiteSearchEngine:
         conn = await self._get_connection("lists")
         try:
             async with conn.transaction():
-                cursor = conn.cursor(query, site_id)
-                async for row in cursor:
+                cursor = await conn.cursor(query, site_id)
+                while True:
+                    with span("lists_query"):
+                        row = await cursor.fetchrow()
+                    if row is None:
+                        break
                     try:
-                        content = "\n".join(f"• {item}" for item in row['items'] if item)
+                        with span("lists_format", list_id=str(row['id'])):
+                            # asyncpg returns jsonb_agg as a JSON string unless a codec is set
+                            items = row['items']
+                            if isinstance(items, str):
+                                items = json.loads(items)
+                            items = [item for item in items or [] if item]
+                            content = "\n".join(f"• {item}" for item in items)
                         if content:
                             yield {
                                 "content": content,
+                                "rows": items,
                                 "metadata": {
                                     "id": row['id'],
                                     "name": row['name'],
                                     "type": ContentType.LIST.value,
-                                    "item_count": len(row['items'])
+                                    "item_count": len(items)
                                 }
                             }
                     except Exception as e:
@@ -319,7 +488,8 @@ class SiteSearchEngine:
     async def close(self):
         """Close all resources"""
         self.executor.shutdown()
-        self.process_executor.shutdown()
+        if self.process_executor:
+            self.process_executor.shutdown()
         await self.redis.close()
         
         for pool in self.pools.values():
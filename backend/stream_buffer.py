@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import uuid
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+START_CURSOR = "0-0"
+CURSOR_PATTERN = re.compile(r"\d+-\d+")
+
+
+class ChatStreamBroker:
+    """
+    Buffers the NDJSON events of each chat request in a Redis stream.
+
+    The computation runs as a background task that appends events to
+    chat:{request_id}:events, so it survives client disconnects. Readers
+    replay the stream from any cursor and then block for new entries.
+    Every request gets a fresh request_id; an identical request arriving
+    while a computation is still running joins it through a dedupe key,
+    but a finished buffer is only replayed through its own request_id.
+    """
+
+    def __init__(self, redis, ttl: Optional[int] = None, block_ms: int = 5000):
+        self.redis = redis
+        self.ttl = ttl or int(os.getenv("CHAT_STREAM_TTL", "300"))
+        self.block_ms = block_ms
+        self.instance_id = uuid.uuid4().hex
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def make_dedupe_key(*parts: str) -> str:
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _events_key(request_id: str) -> str:
+        return f"chat:{request_id}:events"
+
+    @staticmethod
+    def _owner_key(request_id: str) -> str:
+        return f"chat:{request_id}:owner"
+
+    @staticmethod
+    def _dedupe_key(dedupe_key: str) -> str:
+        return f"chat:running:{dedupe_key}"
+
+    @staticmethod
+    def is_valid_cursor(cursor: str) -> bool:
+        """Redis stream entry ID such as 1700000000000-0"""
+        return bool(CURSOR_PATTERN.fullmatch(cursor))
+
+    async def exists(self, request_id: str) -> bool:
+        return bool(await self.redis.exists(self._events_key(request_id), self._owner_key(request_id)))
+
+    async def start(self, produce: Callable[[], AsyncIterator[Dict]], dedupe_key: Optional[str] = None) -> str:
+        """
+        Start a computation and return its request_id. With dedupe_key, an
+        identical computation that is still running is joined instead.
+        """
+        request_id = uuid.uuid4().hex
+        await self.redis.set(self._owner_key(request_id), self.instance_id, ex=self.ttl)
+        if dedupe_key:
+            running_key = self._dedupe_key(dedupe_key)
+            if not await self.redis.set(running_key, request_id, nx=True, ex=self.ttl):
+                running = await self.redis.get(running_key)
+                running = running.decode() if isinstance(running, bytes) else running
+                if running and await self.redis.exists(self._owner_key(running)):
+                    await self.redis.delete(self._owner_key(request_id))
+                    return running
+                # The owner died without releasing the key, compute again
+                await self.redis.set(running_key, request_id, ex=self.ttl)
+
+        task = asyncio.create_task(self._produce(request_id, produce(), dedupe_key))
+        self._tasks[request_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(request_id, None))
+        return request_id
+
+    async def _produce(self, request_id: str, events: AsyncIterator[Dict], dedupe_key: Optional[str]) -> None:
+        try:
+            async for event in events:
+                await self._append(request_id, "event", event, dedupe_key)
+        except asyncio.CancelledError:
+            await self._append(request_id, "event", {"error": "Computation was interrupted, retry the request"})
+            raise
+        except Exception as e:
+            logger.error(f"Chat computation {request_id} failed: {e}")
+            await self._append(request_id, "event", {"error": str(e)})
+        finally:
+            # Release the dedupe key first so new requests do not join a finished answer
+            if dedupe_key:
+                running_key = self._dedupe_key(dedupe_key)
+                running = await self.redis.get(running_key)
+                if running in (request_id, request_id.encode()):
+                    await self.redis.delete(running_key)
+            await self._append(request_id, "done", {})
+            await self.redis.delete(self._owner_key(request_id))
+
+    async def _append(self, request_id: str, kind: str, event: Dict, dedupe_key: Optional[str] = None) -> None:
+        key = self._events_key(request_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xadd(key, {"type": kind, "data": orjson.dumps(event)})
+            pipe.expire(key, self.ttl)
+            pipe.expire(self._owner_key(request_id), self.ttl)
+            if dedupe_key:
+                pipe.expire(self._dedupe_key(dedupe_key), self.ttl)
+            await pipe.execute()
+
+    async def subscribe(self, request_id: str, cursor: Optional[str] = None) -> AsyncGenerator[Tuple[str, Dict], None]:
+        """Yield (event_id, event) after cursor until the computation is done"""
+        key = self._events_key(request_id)
+        last_id = cursor or START_CURSOR
+        while True:
+            response = await self.redis.xread({key: last_id}, count=100, block=self.block_ms)
+            if not response:
+                if request_id not in self._tasks and not await self.redis.exists(self._owner_key(request_id)):
+                    yield last_id, {"error": "Computation is no longer running, retry the request"}
+                    return
+                continue
+
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                if fields[b"type"] == b"done":
+                    return
+                yield last_id, orjson.loads(fields[b"data"])
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        # Let the tasks write their final events while Redis is still open
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from llm_integration import LLMProcessor
+from site_search import SiteSearchEngine
+
+logger = logging.getLogger(__name__)
+
+# Уровни дерева: фрагменты -> разделы (страница, файл, список) -> сайт
+PASSAGE, SECTION, SITE = 0, 1, 2
+SITE_KEY = "site"
+
+# Вопросы про сайт целиком, а не про отдельный факт
+SITE_WIDE_PATTERNS = [r"\bобзор", r"\bперечисл\w*\s+вс[её]\w*"]
+# «О чём сайт?», «Какие разделы на сайте?»: общие слова считаются, только если вопрос явно про сайт
+SITE_SCOPE_PATTERN = r"\bсайт\w*"
+SCOPED_PATTERNS = [r"\bо ч[её]м\b", r"\bв целом\b", r"\bкратко\b", r"\bосновн", r"\bраздел", r"\bсодерж"]
+# «Сколько существует великих музеев мира?», «Какие темы поднимаются?»: количество или перечень
+# по всему корпусу — вопросительное слово и существительное во множественном числе
+QUANTITY_PATTERN = r"\b(?:сколько|какие|каких|какими|перечисл\w*)\b((?:\s+\w+){1,3})"
+PLURAL_ENDINGS = ("ов", "ев", "ей", "ых", "их", "ые", "ие", "ы", "и")
+# Предлоги, сужающие вопрос до конкретной темы: «…для отпуска», «…в Париже»
+NARROWING_PATTERN = r"\b(?:для|у|в|во|на|по|про|о|об|из|от|при|с|со|к|ко)\s+\w+"
+
+
+def _has_specific_entity(question: str) -> bool:
+    """Proper names, quotes or numbers point at a specific thing rather than the whole corpus"""
+    words = re.findall(r"\w+", question)
+    if any(w[0].isupper() for w in words[1:]) or re.search(r"[«\"']|\d", question):
+        return True
+    # «на сайте» задаёт область всего вопроса и ничего не сужает, в отличие от «загрузить на сайт»
+    text = re.sub(r"\b(?:на\s+сайте|по\s+сайту)\b", " ", question.lower())
+    return bool(re.search(NARROWING_PATTERN, text))
+
+
+def is_broad_question(question: str) -> bool:
+    """
+    Questions about the site as a whole rather than a specific fact. False
+    positives are tolerable: the summary answer falls back to the sources
+    when the summaries do not contain the answer.
+    """
+    text = question.lower()
+    if any(re.search(pattern, text) for pattern in SITE_WIDE_PATTERNS):
+        return True
+    if re.search(SITE_SCOPE_PATTERN, text) and any(re.search(p, text) for p in SCOPED_PATTERNS):
+        return True
+    match = re.search(QUANTITY_PATTERN, text)
+    if not match or _has_specific_entity(question):
+        return False
+    return any(len(w) > 3 and w.endswith(PLURAL_ENDINGS) for w in match.group(1).split())
+
+
+def content_hash(*parts: str) -> str:
+    return hashlib.sha1("\x00".join(parts).encode()).hexdigest()
+
+
+def split_passages(text: str, max_chars: int) -> List[str]:
+    passages, current = [], ""
+    for paragraph in text.split("\n"):
+        if current and len(current) + len(paragraph) > max_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+        while len(current) > max_chars:
+            passages.append(current[:max_chars])
+            current = current[max_chars:]
+    if current.strip():
+        passages.append(current)
+    return passages
+
+
+class SummaryTreeStore:
+    """Summary nodes kept in the CMS database next to the site content"""
+
+    def __init__(self, search_engine: SiteSearchEngine):
+        self.search_engine = search_engine
+
+    async def initialize(self):
+        conn = await self.search_engine._get_connection("cms")
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS site_summary_node (
+                    site_id TEXT NOT NULL,
+                    node_key TEXT NOT NULL,
+                    level SMALLINT NOT NULL,
+                    parent_key TEXT,
+                    title TEXT,
+                    content_hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    updated_at TIMESTAMP NOT NULL DEFAULT now(),
+                    PRIMARY KEY (site_id, node_key)
+                )
+            """)
+        finally:
+            await self.search_engine._release_connection(conn, "cms")
+
+    async def get_nodes(self, site_id: str, level: Optional[int] = None) -> Dict[str, Dict]:
+        query = "SELECT node_key, level, parent_key, title, content_hash, summary FROM site_summary_node WHERE site_id = $1"
+        args = [str(site_id)]
+        if level is not None:
+            query += " AND level = $2"
+            args.append(level)
+        conn = await self.search_engine._get_connection("cms")
+        try:
+            rows = await conn.fetch(query, *args)
+            return {row["node_key"]: dict(row) for row in rows}
+        finally:
+            await self.search_engine._release_connection(conn, "cms")
+
+    async def save_nodes(self, site_id: str, nodes: List[Dict], stale_keys: List[str]):
+        conn = await self.search_engine._get_connection("cms")
+        try:
+            async with conn.transaction():
+                if stale_keys:
+                    await conn.execute(
+                        "DELETE FROM site_summary_node WHERE site_id = $1 AND node_key = ANY($2::TEXT[])",
+                        str(site_id), stale_keys
+                    )
+                await conn.executemany("""
+                    INSERT INTO site_summary_node (site_id, node_key, level, parent_key, title, content_hash, summary)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7)
+                    ON CONFLICT (site_id, node_key) DO UPDATE SET
+                        level = EXCLUDED.level, parent_key = EXCLUDED.parent_key, title = EXCLUDED.title,
+                        content_hash = EXCLUDED.content_hash, summary = EXCLUDED.summary, updated_at = now()
+                """, [
+                    (str(site_id), n["node_key"], n["level"], n["parent_key"], n["title"], n["content_hash"], n["summary"])
+                    for n in nodes
+                ])
+        finally:
+            await self.search_engine._release_connection(conn, "cms")
+
+    async def list_published_sites(self) -> List[str]:
+        conn = await self.search_engine._get_connection("cms")
+        try:
+            rows = await conn.fetch("SELECT name FROM sites_site WHERE status = 'published'")
+            return [row["name"] for row in rows]
+        finally:
+            await self.search_engine._release_connection(conn, "cms")
+
+
+class SummaryTreeBuilder:
+    """
+    Builds a passage -> section -> site summary tree for each site.
+
+    Every node stores a hash of its input, so a rebuild only calls the LLM for
+    passages whose text changed and for the sections and site above them.
+    LLM calls go through a dedicated small executor so background summarizing
+    does not take threads from interactive requests.
+    """
+
+    def __init__(self, search_engine: SiteSearchEngine, llm_processor: LLMProcessor):
+        self.search_engine = search_engine
+        self.llm_processor = llm_processor
+        self.store = SummaryTreeStore(search_engine)
+        self.passage_chars = int(os.getenv("SUMMARY_PASSAGE_CHARS", "3000"))
+        self.input_chars = int(os.getenv("SUMMARY_INPUT_CHARS", "6000"))
+        self.context_chars = int(os.getenv("SUMMARY_CONTEXT_CHARS", "6000"))
+        concurrency = int(os.getenv("SUMMARY_CONCURRENCY", "1"))
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="summary")
+        self.slots = asyncio.Semaphore(concurrency)
+
+    async def initialize(self):
+        await self.store.initialize()
+
+    async def build_all(self):
+        for site_name in await self.store.list_published_sites():
+            try:
+                await self.build_site(site_name)
+            except Exception as e:
+                logger.error(f"Summary tree build failed for {site_name}: {e}")
+
+    async def refresh_periodically(self, interval: int):
+        while True:
+            await self.build_all()
+            await asyncio.sleep(interval)
+
+    async def build_site(self, site_name: str):
+        site_id = await self.search_engine._get_site_id_by_name(site_name)
+        if not site_id:
+            raise ValueError(f"Site {site_name} not found or not published")
+
+        existing = await self.store.get_nodes(site_id)
+        changed: List[Dict] = []
+        sections: List[Dict] = []
+        current_keys = {SITE_KEY}
+
+        # Read everything first so DB cursors are not held open during slow LLM calls
+        failed: List[Dict] = []
+        chunks = [chunk async for chunk in self.search_engine.get_site_content(site_name, skipped=failed)]
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            section_key = f"{metadata['type']}:{metadata['id']}"
+            title = metadata.get("title") or metadata.get("name") or section_key
+
+            passages = []
+            for i, text in enumerate(split_passages(chunk["content"], self.passage_chars)):
+                passages.append({
+                    "node_key": f"{section_key}:{i}", "level": PASSAGE, "parent_key": section_key,
+                    "title": title, "content_hash": content_hash(text), "text": text,
+                })
+            passages = await self._summarize_changed(passages, existing, changed)
+            current_keys.update(p["node_key"] for p in passages)
+            current_keys.add(section_key)
+
+            section_hash = content_hash(*(p["content_hash"] for p in passages))
+            section = {
+                "node_key": section_key, "level": SECTION, "parent_key": SITE_KEY,
+                "title": title, "content_hash": section_hash,
+                "text": "\n\n".join(p["summary"] for p in passages),
+            }
+            if len(passages) == 1:
+                section["summary"] = passages[0]["summary"]
+            sections.extend(await self._summarize_changed([section], existing, changed))
+
+        # A source that failed this run is still in the DB listing: keep its stored nodes
+        for source in failed:
+            if "id" not in source:
+                continue
+            section_key = f"{source['type']}:{source['id']}"
+            kept = [k for k in existing if k == section_key or k.startswith(f"{section_key}:")]
+            current_keys.update(kept)
+            if section_key in existing:
+                sections.append(existing[section_key])
+
+        # Sources arrive in completion order; sort so the site hash only changes with content
+        sections.sort(key=lambda s: s["node_key"])
+        site_hash = content_hash(*(s["content_hash"] for s in sections))
+        site_node = {
+            "node_key": SITE_KEY, "level": SITE, "parent_key": None, "title": site_name,
+            "content_hash": site_hash,
+            "text": "\n\n".join(f"{s['title']}: {s['summary']}" for s in sections),
+        }
+        await self._summarize_changed([site_node], existing, changed)
+
+        stale_keys = [k for k in existing if k not in current_keys]
+        await self.store.save_nodes(site_id, changed, stale_keys)
+        logger.info(f"Summary tree for {site_name}: {len(changed)} nodes rebuilt, {len(stale_keys)} removed")
+
+    async def _summarize_changed(self, nodes: List[Dict], existing: Dict[str, Dict], changed: List[Dict]) -> List[Dict]:
+        """Reuse stored summaries whose hash matches, summarize the rest in one batch"""
+        todo = []
+        for node in nodes:
+            stored = existing.get(node["node_key"])
+            if stored and stored["content_hash"] == node["content_hash"]:
+                node["summary"] = stored["summary"]
+            elif "summary" in node:
+                changed.append(node)
+            else:
+                todo.append(node)
+
+        summaries = await asyncio.gather(*(self._summarize(node["text"]) for node in todo))
+        for node, summary in zip(todo, summaries):
+            node["summary"] = summary
+            changed.append(node)
+        return nodes
+
+    async def _summarize(self, text: str) -> str:
+        """Summarize text, first reducing it in parts if it does not fit one prompt"""
+        while len(text) > self.input_chars:
+            parts = split_passages(text, self.input_chars)
+            text = "\n\n".join(await asyncio.gather(*(self._summarize(p) for p in parts)))
+        async with self.slots:
+            return await self.llm_processor.summarize(text, executor=self.executor)
+
+    async def get_context(self, site_name: str) -> Optional[Tuple[str, Dict]]:
+        """
+        Context for a broad question: section summaries when they fit
+        SUMMARY_CONTEXT_CHARS, otherwise the site summary
+        """
+        site_id = await self.search_engine._get_site_id_by_name(site_name)
+        if not site_id:
+            return None
+        sections = await self.store.get_nodes(site_id, SECTION)
+        if not sections:
+            return None
+
+        context = "\n\n".join(f"{n['title']}: {n['summary']}" for n in sections.values())
+        if len(context) <= self.context_chars:
+            return context, {"level": "section", "sections": len(sections)}
+
+        site = await self.store.get_nodes(site_id, SITE)
+        if SITE_KEY not in site:
+            return None
+        return site[SITE_KEY]["summary"], {"level": "site", "sections": len(sections)}
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def main(site_names: List[str]):
+    search_engine = SiteSearchEngine()
+    await search_engine.initialize()
+    builder = SummaryTreeBuilder(search_engine, LLMProcessor())
+    try:
+        await builder.initialize()
+        if site_names:
+            for site_name in site_names:
+                await builder.build_site(site_name)
+        else:
+            await builder.build_all()
+    finally:
+        builder.close()
+        await search_engine.close()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(main(sys.argv[1:]))
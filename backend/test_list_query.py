@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+from list_query import ListQueryEngine, QueryPlanner, ListTable
+
+CITIES = ["Париж", "Мадрид", "Санкт-Петербург", "Нью-Йорк", "Каир", "Лондон", "Москва"]
+
+
+def make_rows(count: int = 200, seed: int = 7) -> list:
+    """Rows shaped like loadtest/seed.py make_list_row, but reproducible"""
+    rng = random.Random(seed)
+    return [
+        {
+            "Название": f"Музей №{i}",
+            "Город": rng.choice(CITIES),
+            "Год основания": rng.randint(1700, 2010),
+            "Посетителей в год": rng.randint(50_000, 9_000_000),
+            "Бесплатный вход": rng.random() < 0.2,
+        }
+        for i in range(count)
+    ]
+
+
+ROWS = make_rows()
+
+
+def rows_where(predicate) -> list:
+    return [row for row in ROWS if predicate(row)]
+
+
+@pytest.fixture(params=["Музеи", "Таблицы: таблица 0"])
+def table_name(request):
+    return request.param
+
+
+def answer(question: str, name: str):
+    return ListQueryEngine().answer("list-1", name, ROWS, question)
+
+
+# Вопрос -> (операция, колонка, ожидаемое значение)
+ANSWERED = [
+    ("Сколько музеев в Париже?", "count", None,
+     len(rows_where(lambda r: r["Город"] == "Париж"))),
+    ("Сколько посетителей у музеев в Москве?", "sum", "Посетителей в год",
+     sum(r["Посетителей в год"] for r in rows_where(lambda r: r["Город"] == "Москва"))),
+    ("Сколько посетителей в год в среднем?", "mean", "Посетителей в год",
+     sum(r["Посетителей в год"] for r in ROWS) / len(ROWS)),
+    ("Какой музей основан раньше всех?", "min", "Год основания",
+     min(r["Год основания"] for r in ROWS)),
+    ("Сколько музеев основано после 1900 года?", "count", None,
+     len(rows_where(lambda r: r["Год основания"] > 1900))),
+    ("Сколько музеев основано от 1800 до 1900 года?", "count", None,
+     len(rows_where(lambda r: 1800 <= r["Год основания"] <= 1900))),
+    ("Сколько музеев от 1800 до 1900 года?", "count", None,
+     len(rows_where(lambda r: 1800 <= r["Год основания"] <= 1900))),
+    ("Сколько музеев в Лондоне без бесплатного входа?", "count", None,
+     len(rows_where(lambda r: r["Город"] == "Лондон" and not r["Бесплатный вход"]))),
+    ("Сколько всего посетителей в год?", "sum", "Посетителей в год",
+     sum(r["Посетителей в год"] for r in ROWS)),
+    ("Сколько музеев с посетителями больше 5 млн?", "count", None,
+     len(rows_where(lambda r: r["Посетителей в год"] > 5_000_000))),
+    ("Сколько музеев с бесплатным входом?", "count", None,
+     len(rows_where(lambda r: r["Бесплатный вход"]))),
+]
+
+
+@pytest.mark.parametrize("question, operation, column, expected", ANSWERED)
+def test_answered(question, operation, column, expected, table_name):
+    result = answer(question, table_name)
+    assert result is not None
+    assert result.query.operation == operation
+    assert result.query.column == column
+    assert result.value == pytest.approx(expected)
+
+
+# Условие, которое нельзя привязать к колонке, или вопрос не к таблице: отдаём текстовому пути
+NOT_ANSWERED = [
+    "Сколько музеев с посещаемостью больше 5 млн?",
+    "Сколько музеев открыто до 18:00?",
+    "Сколько стоит билет?",
+    "Когда основан Эрмитаж?",
+    # Слово, которое не относится ни к колонке, ни к значению
+    "Сколько посетителей в Лувре?",
+    "Сколько платных музеев?",
+    "Сколько стоит вход в музей в Париже?",
+    "Сколько залов в музеях Мадрида?",
+    "Сколько экспонатов в музеях Мадрида?",
+    # Отрицание перед значением
+    "Сколько музеев не в Париже?",
+    "Сколько музеев кроме Лондона?",
+    # Несколько значений одной колонки
+    "Сколько музеев в Париже и Лондоне?",
+    "Сколько музеев в Москве или Каире?",
+    # Год, который нельзя превратить ни в сумму, ни в сравнение
+    "Сколько музеев открылось в 1900 году?",
+    "Сколько музеев основано в 1900 году?",
+    "Сколько музеев основано более 100 лет назад?",
+]
+
+
+@pytest.mark.parametrize("question", NOT_ANSWERED)
+def test_not_answered(question, table_name):
+    assert answer(question, table_name) is None
+
+
+def test_grouped_count():
+    result = answer("Сколько музеев в каждом городе?", "Музеи")
+    assert result.query.operation == "count"
+    assert result.query.group_by == "Город"
+    assert dict(result.groups) == {
+        city.lower(): len(rows_where(lambda r, c=city: r["Город"] == c))
+        for city in CITIES if rows_where(lambda r, c=city: r["Город"] == c)
+    }
+
+
+def test_range_is_inclusive():
+    rows = [{"Название": "А", "Год основания": 1800}, {"Название": "Б", "Год основания": 1900},
+            {"Название": "В", "Год основания": 1950}]
+    table = ListTable("Музеи", rows)
+    query = QueryPlanner().plan("Сколько музеев основано от 1800 до 1900 года?", table)
+    result = ListQueryEngine().execute(table, query, rows)
+    assert result.value == 2
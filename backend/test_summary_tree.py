@@ -0,0 +1,41 @@
+import pytest
+
+from summary_tree import is_broad_question, split_passages
+
+# Вопрос -> относится ли он к сайту целиком
+QUESTIONS = [
+    ("Сколько существует великих музеев мира?", True),
+    ("Какие темы поднимаются в работах?", False),
+    ("Какие темы поднимаются?", True),
+    ("Перечисли все услуги", True),
+    ("Сделай обзор", True),
+    ("О чём этот сайт?", True),
+    ("Какие разделы есть на сайте?", True),
+    ("Кратко расскажи о сайте", True),
+    ("Основное содержание сайта", True),
+    ("Какие документы есть на сайте?", True),
+    ("Сколько всего музеев?", True),
+    ("Сколько стоит билет в Эрмитаж?", False),
+    ("Какие документы нужны для отпуска?", False),
+    ("Все ли сотрудники могут войти в портал?", False),
+    ("О чём говорится в приказе?", False),
+    ("Какие документы загрузить на сайт?", False),
+    ("Сколько музеев в Париже?", False),
+    ("Сколько посетителей у Лувра?", False),
+    ("Когда основан Эрмитаж?", False),
+    ("Как оформить отпуск?", False),
+    ("Сколько лет роману «Война и мир»?", False),
+    ("Какие музеи основаны до 1900 года?", False),
+]
+
+
+@pytest.mark.parametrize("question, broad", QUESTIONS)
+def test_is_broad_question(question, broad):
+    assert is_broad_question(question) is broad
+
+
+def test_split_passages_keeps_text_and_limit():
+    text = "\n".join(f"абзац {i} " + "слово " * 30 for i in range(20))
+    passages = split_passages(text, 500)
+    assert all(len(p) <= 500 for p in passages)
+    assert "".join(passages).replace("\n", "") == text.replace("\n", "")
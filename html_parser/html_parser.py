@@ -1,13 +1,15 @@
+import os
 import psycopg2
 import psycopg2.extras
 from bs4 import BeautifulSoup
 
 def get_site_pages_text(site_name):
-    hostname = "localhost"
-    database = "cms"
-    username = "postgres"
-    password = "123456"
-    port_id = 5432
+    # Те же переменные, что и у бэкенда; значения по умолчанию — прежние
+    hostname = os.getenv("DB_HOST", "localhost")
+    database = os.getenv("DB_NAME", "cms")
+    username = os.getenv("DB_USER", "postgres")
+    password = os.getenv("DB_PASS", "123456")
+    port_id = int(os.getenv("DB_PORT", "5432"))
 
     try:
         with psycopg2.connect(
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+import orjson
+from aiohttp import web
+
+# Параметры модели задержек (по умолчанию — примерно llama3.2 на одном GPU)
+PREFILL_TOKENS_PER_SEC = float(os.getenv("FAKE_OLLAMA_PREFILL_TPS", "2000"))
+DECODE_TOKENS_PER_SEC = float(os.getenv("FAKE_OLLAMA_DECODE_TPS", "40"))
+RESPONSE_TOKENS = int(os.getenv("FAKE_OLLAMA_RESPONSE_TOKENS", "120"))
+NUM_PARALLEL = int(os.getenv("FAKE_OLLAMA_NUM_PARALLEL", "4"))
+JITTER = float(os.getenv("FAKE_OLLAMA_JITTER", "0.1"))
+
+WORDS = ["музей", "экспозиция", "коллекция", "зал", "выставка", "история", "искусство", "город"]
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate, ~4 characters per token"""
+    return max(1, len(text) // 4)
+
+
+class FakeOllama:
+    """
+    Stand-in for the Ollama HTTP API (/api/generate, /api/chat).
+
+    Only NUM_PARALLEL requests are decoded at a time, the rest wait in line,
+    so latency grows with concurrency the same way a real single-GPU server does.
+    """
+
+    def __init__(self, num_parallel: int = NUM_PARALLEL):
+        self.slots = asyncio.Semaphore(num_parallel)
+        self.stats = {"requests": 0, "active": 0, "queued": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/generate", self.generate)
+        app.router.add_post("/api/chat", self.generate)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    async def tags(self, request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": "llama3.2:latest", "model": "llama3.2:latest"}]})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def generate(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        prompt = payload.get("prompt") or "".join(m.get("content", "") for m in payload.get("messages", []))
+        is_chat = request.path.endswith("/chat")
+        self.stats["requests"] += 1
+
+        self.stats["queued"] += 1
+        async with self.slots:
+            self.stats["queued"] -= 1
+            self.stats["active"] += 1
+            try:
+                return await self._respond(request, payload, prompt, is_chat)
+            finally:
+                self.stats["active"] -= 1
+
+    async def _respond(self, request: web.Request, payload: dict, prompt: str, is_chat: bool) -> web.StreamResponse:
+        model = payload.get("model", "llama3.2")
+        prompt_tokens = count_tokens(prompt)
+        started = time.perf_counter()
+        await asyncio.sleep(self._jitter(prompt_tokens / PREFILL_TOKENS_PER_SEC))
+
+        tokens = [random.choice(WORDS) + " " for _ in range(RESPONSE_TOKENS)]
+        if not payload.get("stream", True):
+            await asyncio.sleep(self._jitter(len(tokens) / DECODE_TOKENS_PER_SEC))
+            return web.json_response(self._chunk(model, "".join(tokens), is_chat, True, prompt_tokens, started))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            await asyncio.sleep(self._jitter(1 / DECODE_TOKENS_PER_SEC))
+            await response.write(orjson.dumps(self._chunk(model, token, is_chat, False)) + b"\n")
+        await response.write(orjson.dumps(self._chunk(model, "", is_chat, True, prompt_tokens, started)) + b"\n")
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _jitter(seconds: float) -> float:
+        return max(0.0, seconds * random.uniform(1 - JITTER, 1 + JITTER))
+
+    @staticmethod
+    def _chunk(model: str, text: str, is_chat: bool, done: bool,
+               prompt_tokens: int = 0, started: float = 0.0) -> dict:
+        chunk = {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": done,
+        }
+        if is_chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        if done:
+            chunk.update({
+                "done_reason": "stop",
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": RESPONSE_TOKENS,
+            })
+        return chunk
+
+
+if __name__ == "__main__":
+    web.run_app(FakeOllama().make_app(), port=int(os.getenv("FAKE_OLLAMA_PORT", "11435")))
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import random
+
+from aiohttp import web
+
+STORAGE_DIR = os.getenv("FAKE_STORAGE_DIR", "storage_data")
+# Задержка первого байта и пропускная способность, как у объектного хранилища
+LATENCY_MS = float(os.getenv("FAKE_STORAGE_LATENCY_MS", "40"))
+BANDWIDTH_MBPS = float(os.getenv("FAKE_STORAGE_BANDWIDTH_MBPS", "50"))
+
+
+class FakeStorage:
+    """Local HTTP stand-in for the media/ bucket, serving files from a directory"""
+
+    def __init__(self, root: str = STORAGE_DIR):
+        self.root = os.path.abspath(root)
+        self.stats = {"requests": 0, "bytes": 0, "not_found": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/media/{path:.+}", self.get_object)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def get_object(self, request: web.Request) -> web.Response:
+        self.stats["requests"] += 1
+        path = os.path.abspath(os.path.join(self.root, request.match_info["path"]))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            self.stats["not_found"] += 1
+            raise web.HTTPNotFound()
+
+        with open(path, "rb") as f:
+            body = f.read()
+        delay = LATENCY_MS / 1000 * random.uniform(0.5, 1.5) + len(body) / (BANDWIDTH_MBPS * 1024 * 1024)
+        await asyncio.sleep(delay)
+        self.stats["bytes"] += len(body)
+        return web.Response(body=body, content_type="application/octet-stream")
+
+
+if __name__ == "__main__":
+    web.run_app(FakeStorage().make_app(), port=int(os.getenv("FAKE_STORAGE_PORT", "9000")))
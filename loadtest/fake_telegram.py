@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+import time
+from typing import Callable, Dict, List
+
+import orjson
+from aiohttp import web
+
+BOT_USER = {
+    "id": 100000,
+    "is_bot": True,
+    "first_name": "LoadTestBot",
+    "username": "load_test_bot",
+    "can_join_groups": False,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+
+class FakeTelegram:
+    """
+    Minimal Telegram Bot API server for driving the bot under load.
+
+    Test sessions push user messages with send_user_message(); the bot picks
+    them up through getUpdates. Everything the bot sends back is recorded per
+    chat so sessions can wait for replies and measure latency.
+    """
+
+    def __init__(self):
+        self.updates: List[Dict] = []
+        self.new_update = asyncio.Condition()
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.waiters: Dict[int, List] = {}
+        self.polling = asyncio.Event()
+        self.stats = {"updates": 0, "sent_messages": 0, "chat_actions": 0}
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/bot{token}/{method}", self.handle_method)
+        return app
+
+    async def send_user_message(self, chat_id: int, text: str) -> None:
+        message = {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+
+        async with self.new_update:
+            self.updates.append({"update_id": next(self.update_ids), "message": message})
+            self.stats["updates"] += 1
+            self.new_update.notify_all()
+
+    def expect_reply(self, chat_id: int, predicate: Callable[[Dict], bool]) -> asyncio.Future:
+        """
+        Register interest in the next outgoing event for the chat that matches predicate.
+        Call before sending the user message so a fast reply is not missed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(chat_id, []).append((predicate, future))
+        future.add_done_callback(lambda f: self._forget(chat_id, predicate, f))
+        return future
+
+    def _forget(self, chat_id: int, predicate: Callable, future: asyncio.Future) -> None:
+        chat_waiters = self.waiters.get(chat_id, [])
+        if (predicate, future) in chat_waiters:
+            chat_waiters.remove((predicate, future))
+        if not chat_waiters:
+            self.waiters.pop(chat_id, None)
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        params = await self._read_params(request)
+        method = request.match_info["method"]
+        handler = getattr(self, f"api_{method.lower()}", None)
+        if handler is None:
+            return web.json_response({"ok": True, "result": True})
+        return web.json_response({"ok": True, "result": await handler(params)}, dumps=lambda o: orjson.dumps(o).decode())
+
+    async def api_getme(self, params: Dict) -> Dict:
+        return BOT_USER
+
+    async def api_getupdates(self, params: Dict) -> List[Dict]:
+        offset = int(params.get("offset") or 0)
+        timeout = min(float(params.get("timeout") or 0), 10)
+        self.polling.set()
+        async with self.new_update:
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            if not self.updates and timeout:
+                try:
+                    await asyncio.wait_for(self.new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return list(self.updates[:100])
+
+    async def api_sendmessage(self, params: Dict) -> Dict:
+        chat_id = int(params["chat_id"])
+        self.stats["sent_messages"] += 1
+        message = {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+        self._dispatch(chat_id, {"kind": "message", "text": message["text"], "at": time.perf_counter()})
+        return message
+
+    async def api_sendchataction(self, params: Dict) -> bool:
+        chat_id = int(params["chat_id"])
+        self.stats["chat_actions"] += 1
+        self._dispatch(chat_id, {"kind": "action", "text": params.get("action", ""), "at": time.perf_counter()})
+        return True
+
+    def _dispatch(self, chat_id: int, event: Dict) -> None:
+        for predicate, future in list(self.waiters.get(chat_id, [])):
+            if not future.done() and predicate(event):
+                future.set_result(event)
+
+    @staticmethod
+    async def _read_params(request: web.Request) -> Dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = dict(await request.post())
+        params.update(request.query)
+        return params
+
+    @staticmethod
+    def first_reply(event: Dict) -> bool:
+        return True
+
+    @staticmethod
+    def final_reply(event: Dict) -> bool:
+        return event["kind"] == "message" and not event["text"].startswith(("Запрос в очереди", "Загружаю"))
+
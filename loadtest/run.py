@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import orjson
+from aiohttp import web
+
+from fake_ollama import FakeOllama
+from fake_storage import FakeStorage
+from fake_telegram import FakeTelegram
+from seed import add_db_arguments, add_seed_arguments, seed
+from sessions import ApiSession, BotSession, Recorder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_BOT_TOKEN = "123456:LOADTEST"
+
+
+async def start_site(app: web.Application, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def service_env(args) -> Dict[str, str]:
+    """Environment that points the API and the bot at the local stand-ins"""
+    env = dict(os.environ)
+    env.update({
+        "OLLAMA_HOST": f"http://127.0.0.1:{args.ollama_port}",
+        "MEDIA_BASE_URL": f"http://127.0.0.1:{args.storage_port}/media/",
+        "DB_HOST": args.host,
+        "DB_PORT": str(args.port),
+        "DB_NAME": args.database,
+        "LISTS_DB_NAME": args.database,
+        "STORAGE_DB_NAME": args.database,
+        "DB_USER": args.user,
+        "DB_PASS": args.password or "",
+        "BOT_TOKEN": FAKE_BOT_TOKEN,
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{args.telegram_port}/bot",
+    })
+    return env
+
+
+def spawn_api(args) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.api_port),
+         "--workers", str(args.api_workers), "--log-level", "warning"],
+        cwd=os.path.join(ROOT, "backend"), env=service_env(args)
+    )
+
+
+def spawn_bot(args) -> subprocess.Popen:
+    env = service_env(args)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.join(ROOT, "html_parser"), os.path.join(ROOT, "LLM"), env.get("PYTHONPATH", "")]
+    )
+    return subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(ROOT, "tg-bot"), env=env)
+
+
+async def wait_for_api(api_url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(api_url.rstrip("/") + "/docs") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"API at {api_url} did not start in {timeout}s")
+
+
+async def run_level(make_session, concurrency: int, duration: float, questions: int) -> Dict:
+    """Keep `concurrency` users busy with back-to-back sessions for `duration` seconds"""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            await make_session().run(recorder, questions)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    recorder.close()
+    return recorder.summary()
+
+
+async def ramp(target: str, make_session, args) -> List[Dict]:
+    curve = []
+    for concurrency in args.levels:
+        print(f"[{target}] concurrency={concurrency} ...", flush=True)
+        summary = await run_level(make_session, concurrency, args.duration, args.questions)
+        summary["concurrency"] = concurrency
+        curve.append(summary)
+        print_row(summary)
+        if args.stop_error_rate and summary["error_rate"] >= args.stop_error_rate:
+            print(f"[{target}] error rate {summary['error_rate']:.0%}, stopping ramp")
+            break
+    return curve
+
+
+def fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_row(s: Dict) -> None:
+    print(
+        f"  conc={s['concurrency']:<4} req={s['requests']:<6} rps={s['throughput_rps']:<7.2f} "
+        f"err={s['error_rate']:<6.1%} "
+        f"lat p50/p95/p99={fmt(s['latency']['p50'])}/{fmt(s['latency']['p95'])}/{fmt(s['latency']['p99'])}ms "
+        f"ttfb p50/p95/p99={fmt(s['ttfb']['p50'])}/{fmt(s['ttfb']['p95'])}/{fmt(s['ttfb']['p99'])}ms",
+        flush=True
+    )
+
+
+def print_saturation(target: str, curve: List[Dict]) -> None:
+    """Throughput vs concurrency: the knee is where rps stops growing and p95 starts climbing"""
+    if not curve:
+        return
+    peak = max(curve, key=lambda s: s["throughput_rps"])
+    print(f"\n[{target}] saturation curve (peak {peak['throughput_rps']:.2f} rps at concurrency {peak['concurrency']})")
+    scale = 40 / peak["throughput_rps"] if peak["throughput_rps"] else 0
+    for s in curve:
+        bar = "#" * int(s["throughput_rps"] * scale)
+        print(f"  {s['concurrency']:>4} | {bar:<40} {s['throughput_rps']:.2f} rps, p95 {fmt(s['latency']['p95'])}ms")
+
+
+async def main(args) -> None:
+    if args.seed_db:
+        await seed(args)
+
+    ollama = FakeOllama(args.ollama_parallel)
+    storage = FakeStorage(args.storage_dir)
+    telegram = FakeTelegram()
+    runners = [
+        await start_site(ollama.make_app(), args.ollama_port),
+        await start_site(storage.make_app(), args.storage_port),
+        await start_site(telegram.make_app(), args.telegram_port),
+    ]
+
+    processes = []
+    report = {"config": {k: v for k, v in vars(args).items() if k != "password"}, "results": {}}
+    try:
+        if "api" in args.targets:
+            api_url = args.api_url
+            if not api_url:
+                processes.append(spawn_api(args))
+                api_url = f"http://127.0.0.1:{args.api_port}"
+            await wait_for_api(api_url)
+            connector = aiohttp.TCPConnector(limit=0)
+            async with aiohttp.ClientSession(connector=connector) as http:
+                report["results"]["api"] = await ramp(
+                    "api", lambda: ApiSession(http, api_url, args.timeout), args
+                )
+
+        if "bot" in args.targets:
+            if args.spawn_bot:
+                processes.append(spawn_bot(args))
+            await asyncio.wait_for(telegram.polling.wait(), 60)
+            report["results"]["bot"] = await ramp(
+                "bot", lambda: BotSession(telegram, args.timeout), args
+            )
+
+        report["fakes"] = {"ollama": ollama.stats, "storage": storage.stats, "telegram": telegram.stats}
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGINT)
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for runner in runners:
+            await runner.cleanup()
+
+    for target, curve in report["results"].items():
+        print_saturation(target, curve)
+    with open(args.report, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"\nReport written to {args.report}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end load test for /api/chat and the Telegram bot")
+    parser.add_argument("--targets", nargs="+", choices=["api", "bot"], default=["api", "bot"])
+    parser.add_argument("--levels", type=lambda v: [int(x) for x in v.split(",")], default=[1, 2, 4, 8, 16, 32],
+                        help="comma-separated concurrency levels to ramp through")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--questions", type=int, default=3, help="questions per user session")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout, seconds")
+    parser.add_argument("--stop-error-rate", type=float, default=0.5,
+                        help="stop ramping once this error rate is reached (0 disables)")
+    parser.add_argument("--api-url", help="use an already running API instead of spawning uvicorn")
+    parser.add_argument("--api-port", type=int, default=8800)
+    parser.add_argument("--api-workers", type=int, default=1)
+    parser.add_argument("--no-spawn-bot", dest="spawn_bot", action="store_false",
+                        help="bot is started separately with TELEGRAM_API_URL pointing at the fake")
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--ollama-parallel", type=int, default=int(os.getenv("FAKE_OLLAMA_NUM_PARALLEL", "4")))
+    parser.add_argument("--storage-port", type=int, default=9000)
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--seed-db", action="store_true", help="create and seed the database before the run")
+    parser.add_argument("--report", default="loadtest_report.json")
+    add_db_arguments(parser)
+    add_seed_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
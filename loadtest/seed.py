@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import asyncpg
+import orjson
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users_user (
+        keycloak_id UUID PRIMARY KEY,
+        email TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sites_site (
+        id UUID PRIMARY KEY,
+        name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        root_folder_id UUID,
+        filestorage_root_folder_id UUID
+    );
+    CREATE TABLE IF NOT EXISTS sites_serviceobject (
+        id UUID PRIMARY KEY,
+        site_id UUID NOT NULL,
+        external_id TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS pages_page (
+        id UUID PRIMARY KEY,
+        name TEXT NOT NULL,
+        slug TEXT NOT NULL,
+        body TEXT,
+        status TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        created_by_id UUID
+    );
+    CREATE TABLE IF NOT EXISTS lists_list (
+        id UUID PRIMARY KEY,
+        name TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS lists_list_row (
+        id UUID PRIMARY KEY,
+        list_id UUID NOT NULL,
+        data JSONB
+    );
+    CREATE TABLE IF NOT EXISTS storage_storageobject (
+        id UUID PRIMARY KEY,
+        name TEXT NOT NULL,
+        type INTEGER NOT NULL,
+        parent_id UUID,
+        size BIGINT
+    );
+    CREATE TABLE IF NOT EXISTS storage_version (
+        id UUID PRIMARY KEY,
+        storage_object_id UUID NOT NULL,
+        link TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sites_serviceobject_site_idx ON sites_serviceobject (site_id);
+    CREATE INDEX IF NOT EXISTS storage_storageobject_parent_idx ON storage_storageobject (parent_id);
+    CREATE INDEX IF NOT EXISTS lists_list_row_list_idx ON lists_list_row (list_id);
+"""
+
+TABLES = [
+    "users_user", "sites_site", "sites_serviceobject", "pages_page", "lists_list",
+    "lists_list_row", "storage_storageobject", "storage_version",
+]
+
+SITES = [
+    "People hub инструкции",
+    "People hub архитектура",
+    "Информация о Хакатоне",
+    "Работы Фролова",
+    "Музеи",
+    "Литература",
+    "Таблицы"
+]
+
+SENTENCES = [
+    "Музей Прадо в Мадриде хранит одно из самых значительных художественных собраний Европы.",
+    "Лувр остаётся самым посещаемым музеем мира и архитектурным символом Парижа.",
+    "Государственный Эрмитаж основан Екатериной II в 1764 году и занимает шесть исторических зданий.",
+    "Метрополитен-музей — крупнейший художественный музей США.",
+    "Для доступа к порталу сотрудник авторизуется через корпоративный Keycloak.",
+    "Сервис профилей хранит данные сотрудников в PostgreSQL и публикует события в очередь.",
+    "Команды хакатона сдают решение до 18:00 последнего дня и защищают его перед жюри.",
+    "Роман написан в 1869 году и переведён более чем на сорок языков.",
+    "Для отпуска нужно оформить заявку в разделе «Мои заявки» не позднее чем за две недели.",
+    "Каждый сервис разворачивается в Kubernetes с отдельным namespace для стенда.",
+]
+
+CITIES = ["Париж", "Мадрид", "Санкт-Петербург", "Нью-Йорк", "Каир", "Лондон", "Москва"]
+
+
+def make_paragraphs(count: int) -> list:
+    return [" ".join(random.choices(SENTENCES, k=random.randint(3, 8))) for _ in range(count)]
+
+
+def make_page_html(title: str, paragraphs: int) -> str:
+    body = "".join(f"<p>{p}</p>" for p in make_paragraphs(paragraphs))
+    return f"<h1>{title}</h1><script>window.analytics=1</script>{body}"
+
+
+def make_list_row(i: int) -> dict:
+    return {
+        "Название": f"Музей №{i}",
+        "Город": random.choice(CITIES),
+        "Год основания": random.randint(1700, 2010),
+        "Посетителей в год": random.randint(50_000, 9_000_000),
+        "Бесплатный вход": random.random() < 0.2,
+    }
+
+
+async def seed_site(conn, site_name: str, args, storage_dir: str, author_id: uuid.UUID) -> None:
+    site_id = uuid.uuid4()
+    root_folder_id = uuid.uuid4()
+    now = datetime.now()
+
+    await conn.execute(
+        "INSERT INTO sites_site (id, name, status, root_folder_id, filestorage_root_folder_id) "
+        "VALUES ($1, $2, 'published', $3, $3)",
+        site_id, site_name, root_folder_id
+    )
+
+    pages = []
+    for i in range(args.pages):
+        page_id = uuid.uuid4()
+        updated = now - timedelta(days=random.randint(0, 365))
+        pages.append((page_id, f"{site_name}: страница {i}", f"page-{i}",
+                      make_page_html(f"{site_name} {i}", args.paragraphs), "published",
+                      updated - timedelta(days=30), updated, author_id))
+    await conn.executemany(
+        "INSERT INTO pages_page (id, name, slug, body, status, created_at, updated_at, created_by_id) "
+        "VALUES ($1, $2, $3, $4, $5, $6, $7, $8)",
+        pages
+    )
+
+    lists = [(uuid.uuid4(), f"{site_name}: таблица {i}") for i in range(args.lists)]
+    await conn.executemany("INSERT INTO lists_list (id, name) VALUES ($1, $2)", lists)
+    await conn.executemany(
+        "INSERT INTO lists_list_row (id, list_id, data) VALUES ($1, $2, $3::jsonb)",
+        [(uuid.uuid4(), list_id, orjson.dumps(make_list_row(i)).decode())
+         for list_id, _ in lists for i in range(args.rows)]
+    )
+
+    await conn.executemany(
+        "INSERT INTO sites_serviceobject (id, site_id, external_id) VALUES ($1, $2, $3)",
+        [(uuid.uuid4(), site_id, str(object_id)) for object_id, *_ in pages + lists]
+    )
+
+    # Дерево файлов: корневая папка, подпапки и текстовые файлы в локальном хранилище
+    folders = [root_folder_id]
+    objects = [(root_folder_id, site_name, 0, None, 0)]
+    for i in range(max(1, args.files // 5)):
+        folder_id = uuid.uuid4()
+        objects.append((folder_id, f"Папка {i}", 0, random.choice(folders), 0))
+        folders.append(folder_id)
+
+    versions = []
+    for i in range(args.files):
+        file_id = uuid.uuid4()
+        link = f"{site_id}/{file_id}.txt"
+        text = "\n\n".join(make_paragraphs(args.paragraphs * 2))
+        path = os.path.join(storage_dir, link)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        objects.append((file_id, f"Документ {i}.txt", 1, random.choice(folders), len(text.encode())))
+        versions.append((uuid.uuid4(), file_id, link, now))
+
+    await conn.executemany(
+        "INSERT INTO storage_storageobject (id, name, type, parent_id, size) VALUES ($1, $2, $3, $4, $5)",
+        objects
+    )
+    await conn.executemany(
+        "INSERT INTO storage_version (id, storage_object_id, link, created_at) VALUES ($1, $2, $3, $4)",
+        versions
+    )
+
+
+async def seed(args) -> None:
+    """Create the CMS/lists/filestorage tables in one database and fill them with test data"""
+    random.seed(args.seed)
+    conn = await asyncpg.connect(
+        host=args.host, port=args.port, database=args.database,
+        user=args.user, password=args.password
+    )
+    try:
+        await conn.execute(SCHEMA)
+        if args.reset:
+            await conn.execute(f"TRUNCATE {', '.join(TABLES)}")
+
+        author_id = uuid.uuid4()
+        await conn.execute(
+            "INSERT INTO users_user (keycloak_id, email) VALUES ($1, $2)",
+            author_id, "author@example.com"
+        )
+        for site_name in SITES:
+            async with conn.transaction():
+                await seed_site(conn, site_name, args, args.storage_dir, author_id)
+        print(f"Seeded {len(SITES)} sites into {args.database}, files in {args.storage_dir}")
+    finally:
+        await conn.close()
+
+
+def add_db_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--host", default=os.getenv("DB_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("DB_PORT", "5432")))
+    parser.add_argument("--database", default=os.getenv("LOADTEST_DB_NAME", "cms"))
+    parser.add_argument("--user", default=os.getenv("DB_USER", "postgres"))
+    parser.add_argument("--password", default=os.getenv("DB_PASS"))
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--storage-dir", default=os.getenv("FAKE_STORAGE_DIR", "storage_data"))
+    parser.add_argument("--pages", type=int, default=40, help="pages per site")
+    parser.add_argument("--paragraphs", type=int, default=6, help="paragraphs per page")
+    parser.add_argument("--lists", type=int, default=3, help="lists per site")
+    parser.add_argument("--rows", type=int, default=200, help="rows per list")
+    parser.add_argument("--files", type=int, default=10, help="files per site")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="truncate tables before seeding")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a local Postgres with realistic site data")
+    add_db_arguments(parser)
+    add_seed_arguments(parser)
+    asyncio.run(seed(parser.parse_args()))
@@ -0,0 +1,148 @@
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import aiohttp
+import orjson
+
+from fake_telegram import FakeTelegram
+
+QUESTIONS = {
+    "Музеи": ["Сколько существует великих музеев мира?", "О чём этот сайт?", "Когда основан Эрмитаж?", "Какой музей самый посещаемый?"],
+    "Таблицы": ["Сколько музеев в Париже?", "Какой музей основан раньше всех?", "Сколько посетителей в год в среднем?"],
+    "Литература": ["Когда написан роман?", "На сколько языков переведён роман?"],
+    "Информация о Хакатоне": ["До какого времени сдавать решение?", "Кто оценивает решения?"],
+    "People hub инструкции": ["Как оформить отпуск?", "Как войти в портал?"],
+    "People hub архитектура": ["Где хранятся данные сотрудников?", "Как разворачиваются сервисы?"],
+    "Работы Фролова": ["О чём эти работы?"],
+}
+
+
+@dataclass
+class Sample:
+    step: str
+    latency: float
+    ttfb: Optional[float]
+    ok: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class Recorder:
+    """Collects samples for one concurrency level"""
+    samples: List[Sample] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    def add(self, sample: Sample) -> None:
+        self.samples.append(sample)
+
+    def close(self) -> None:
+        self.finished = time.perf_counter()
+
+    def summary(self) -> Dict:
+        ok = [s for s in self.samples if s.ok]
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        errors: Dict[str, int] = {}
+        for s in self.samples:
+            if not s.ok:
+                errors[s.error or "unknown"] = errors.get(s.error or "unknown", 0) + 1
+        return {
+            "requests": len(self.samples),
+            "errors": len(self.samples) - len(ok),
+            "error_rate": (len(self.samples) - len(ok)) / len(self.samples) if self.samples else 0.0,
+            "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+            "latency": percentiles([s.latency for s in ok]),
+            "ttfb": percentiles([s.ttfb for s in ok if s.ttfb is not None]),
+            "error_kinds": errors,
+        }
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def pick_script(questions_per_session: int) -> tuple:
+    site = random.choice(list(QUESTIONS))
+    return site, [random.choice(QUESTIONS[site]) for _ in range(questions_per_session)]
+
+
+class ApiSession:
+    """Scripted user of /api/chat: picks a site and asks several questions"""
+
+    def __init__(self, http: aiohttp.ClientSession, api_url: str, timeout: float):
+        self.http = http
+        self.api_url = api_url.rstrip("/") + "/api/chat"
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def run(self, recorder: Recorder, questions_per_session: int) -> None:
+        site, questions = pick_script(questions_per_session)
+        for question in questions:
+            recorder.add(await self.ask(site, question))
+
+    async def ask(self, site: str, question: str) -> Sample:
+        started = time.perf_counter()
+        ttfb = None
+        try:
+            async with self.http.post(self.api_url, json={"site_name": site, "question": question},
+                                      timeout=self.timeout) as response:
+                if response.status != 200:
+                    return Sample("question", time.perf_counter() - started, None, False, f"http_{response.status}")
+                error = None
+                async for line in response.content:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    if line.strip() and "error" in orjson.loads(line):
+                        error = "stream_error"
+                return Sample("question", time.perf_counter() - started, ttfb, error is None, error)
+        except asyncio.TimeoutError:
+            return Sample("question", time.perf_counter() - started, ttfb, False, "timeout")
+        except Exception as e:
+            return Sample("question", time.perf_counter() - started, ttfb, False, type(e).__name__)
+
+
+class BotSession:
+    """Scripted Telegram user talking to the bot through the fake Bot API"""
+
+    chat_ids = itertools.count(1_000_000)
+
+    def __init__(self, telegram: FakeTelegram, timeout: float):
+        self.telegram = telegram
+        self.timeout = timeout
+        # У каждой сессии свой пользователь, чтобы не упираться в антиспам
+        self.chat_id = next(self.chat_ids)
+
+    async def run(self, recorder: Recorder, questions_per_session: int) -> None:
+        site, questions = pick_script(questions_per_session)
+        recorder.add(await self.send("start", "/start"))
+        sample = await self.send("site", site)
+        recorder.add(sample)
+        if not sample.ok:
+            return
+        for question in questions:
+            recorder.add(await self.send("question", question))
+
+    async def send(self, step: str, text: str) -> Sample:
+        first = self.telegram.expect_reply(self.chat_id, FakeTelegram.first_reply)
+        final = self.telegram.expect_reply(self.chat_id, FakeTelegram.final_reply)
+        started = time.perf_counter()
+        await self.telegram.send_user_message(self.chat_id, text)
+        try:
+            reply = await asyncio.wait_for(final, self.timeout)
+        except asyncio.TimeoutError:
+            first.cancel()
+            return Sample(step, time.perf_counter() - started, None, False, "timeout")
+
+        ttfb = first.result()["at"] - started
+        ok = not reply["text"].startswith(("Ошибка", "Лимит"))
+        return Sample(step, reply["at"] - started, ttfb, ok, None if ok else reply["text"][:40])
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Dict, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class UserSerialUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обработка обновлений параллельно (не более max_concurrent_updates одновременно),
+    но строго по порядку для каждого пользователя.
+
+    Повтор вопроса, который уже ждёт ответа, не обрабатывается заново: пользователь
+    получает короткое сообщение об этом, а повторы старше max_update_age (накопились,
+    пока бот был недоступен) отбрасываются молча. Остальные устаревшие сообщения
+    обрабатываются как обычно.
+    Если все слоты заняты, пользователь сразу получает сообщение с позицией в очереди.
+
+    Семафор базового класса задан с запасом: обновления, ждущие своей
+    очереди у пользователя, не должны занимать слоты, поэтому общий лимит
+    держим в собственном семафоре внутри do_process_update.
+    """
+
+    UNBOUNDED_UPDATES = 2 ** 16
+
+    def __init__(self, max_concurrent_updates: int, max_update_age: int = 120):
+        super().__init__(self.UNBOUNDED_UPDATES)
+        self.max_update_age = max_update_age
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._user_refs: Dict[int, int] = {}
+        self._pending_questions: Set[Tuple[int, str]] = set()
+        self._waiting = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user_id = self._get_user_id(update)
+        if user_id is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        question_key = self._get_question_key(update, user_id)
+        if question_key and question_key in self._pending_questions:
+            coroutine.close()
+            if self._is_stale(update):
+                # Повтор, накопившийся пока бот был недоступен: ответ на первый такой вопрос и так придёт
+                logger.info(f"Пропущен устаревший повтор вопроса от {user_id}")
+            else:
+                logger.info(f"Пропущен повторный вопрос от {user_id}")
+                await self._reply(update, "Этот вопрос уже обрабатывается, ответ придёт одним сообщением.")
+            return
+
+        if question_key:
+            self._pending_questions.add(question_key)
+        lock = self._acquire_user_lock(user_id)
+        try:
+            async with lock:
+                await self._run_in_slot(update, coroutine)
+        finally:
+            if question_key:
+                self._pending_questions.discard(question_key)
+            self._release_user_lock(user_id)
+
+    async def _run_in_slot(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self._slots.locked():
+            self._waiting += 1
+            try:
+                await self._notify_queued(update, self._waiting)
+                await self._slots.acquire()
+            finally:
+                self._waiting -= 1
+        else:
+            await self._slots.acquire()
+
+        try:
+            await coroutine
+        finally:
+            self._slots.release()
+
+    async def _notify_queued(self, update: object, position: int) -> None:
+        await self._reply(update, f"Запрос в очереди, позиция {position}.")
+
+    @staticmethod
+    async def _reply(update: object, text: str) -> None:
+        if not isinstance(update, Update) or not update.message:
+            return
+        try:
+            await update.message.reply_text(text)
+        except Exception as e:
+            logger.error(f"Не удалось отправить служебное сообщение: {e}")
+
+    def _acquire_user_lock(self, user_id: int) -> asyncio.Lock:
+        self._user_refs[user_id] = self._user_refs.get(user_id, 0) + 1
+        return self._user_locks.setdefault(user_id, asyncio.Lock())
+
+    def _release_user_lock(self, user_id: int) -> None:
+        self._user_refs[user_id] -= 1
+        if not self._user_refs[user_id]:
+            del self._user_refs[user_id]
+            del self._user_locks[user_id]
+
+    def _is_stale(self, update: object) -> bool:
+        if not isinstance(update, Update) or not update.message:
+            return False
+        age = datetime.now(timezone.utc) - update.message.date
+        return age.total_seconds() > self.max_update_age
+
+    @staticmethod
+    def _get_user_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_user:
+            return update.effective_user.id
+        return None
+
+    @staticmethod
+    def _get_question_key(update: object, user_id: int) -> Optional[Tuple[int, str]]:
+        if not isinstance(update, Update) or not update.message or not update.message.text:
+            return None
+        return user_id, update.message.text.strip().lower()
@@ -14,12 +14,17 @@ import asyncio
 import html_parser
 import llm_connection
 import antispam
+from dispatcher import UserSerialUpdateProcessor
 
 # Загрузка переменных из .env
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "16"))
+MAX_UPDATE_AGE = int(os.getenv("MAX_UPDATE_AGE", "120"))
 
-user_data = eval(os.getenv("USER_DATA", "{}"))
+# Общий с antispam словарь: антиспам создаёт запись пользователя, обработчики её дополняют
+user_data = antispam.user_data
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -64,7 +69,11 @@ async def handle_site_selection(update: Update, context: ContextTypes.DEFAULT_TY
 
     await update.message.reply_text(f"Загружаю данные из '{site_name}'...")
     try:
-        text = html_parser.get_site_pages_text(site_name)
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(None, html_parser.get_site_pages_text, site_name)
+        if text is None:
+            # html_parser возвращает None, если не смог прочитать базу
+            raise RuntimeError(f"не удалось прочитать страницы сайта '{site_name}'")
         user_data[user_id].update({"text": text, "site": site_name})
         await update.message.reply_text(
             f"Готово! Теперь задайте вопрос из области сайта'{site_name}'.",
@@ -107,7 +116,14 @@ async def handle_question(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await update.message.reply_text("Ошибка генерации ответа.")
 
 def main() -> None:
-    application = Application.builder().token(BOT_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(UserSerialUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_UPDATE_AGE))
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(TELEGRAM_API_URL)
+    application = builder.build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.Text(SITES), handle_site_selection))
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from telegram import Chat, Message, Update, User
+
+from dispatcher import UserSerialUpdateProcessor
+
+
+class FakeBot:
+    """Collects what the processor sends instead of calling the Bot API"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def make_update(bot: FakeBot, update_id: int, user_id: int, text: str, age: float = 0) -> Update:
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc) - timedelta(seconds=age),
+        chat=Chat(id=user_id, type=Chat.PRIVATE),
+        from_user=User(id=user_id, first_name="user", is_bot=False),
+        text=text,
+    )
+    message.set_bot(bot)
+    return Update(update_id=update_id, message=message)
+
+
+async def handle(log: list, name: str, delay: float = 0.01, running: list = None):
+    """Stands in for Application.process_update: records start/end and tracks concurrency"""
+    log.append(("start", name))
+    if running is not None:
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+    await asyncio.sleep(delay)
+    if running is not None:
+        running[0] -= 1
+    log.append(("end", name))
+
+
+def run(processor: UserSerialUpdateProcessor, jobs):
+    async def main():
+        await asyncio.gather(*(processor.process_update(update, coroutine) for update, coroutine in jobs))
+    asyncio.run(main())
+
+
+def test_updates_of_one_user_run_in_order():
+    bot, log = FakeBot(), []
+    processor = UserSerialUpdateProcessor(max_concurrent_updates=8)
+    run(processor, [(make_update(bot, i, 1, f"вопрос {i}"), handle(log, f"q{i}", 0.03 - i * 0.01))
+                    for i in range(3)])
+    assert log == [("start", "q0"), ("end", "q0"), ("start", "q1"), ("end", "q1"), ("start", "q2"), ("end", "q2")]
+
+
+def test_global_limit_and_queue_position():
+    bot, log, running = FakeBot(), [], [0, 0]
+    processor = UserSerialUpdateProcessor(max_concurrent_updates=2)
+    run(processor, [(make_update(bot, i, 100 + i, "вопрос"), handle(log, f"u{i}", 0.02, running))
+                    for i in range(4)])
+    assert running[1] == 2
+    assert len([entry for entry in log if entry[0] == "end"]) == 4
+    assert sorted(text for _, text in bot.sent) == ["Запрос в очереди, позиция 1.", "Запрос в очереди, позиция 2."]
+
+
+def test_pending_duplicate_is_dropped_with_reply():
+    bot, log = FakeBot(), []
+    processor = UserSerialUpdateProcessor(max_concurrent_updates=8)
+    run(processor, [(make_update(bot, 1, 1, "Когда основан Эрмитаж?"), handle(log, "first")),
+                    (make_update(bot, 2, 1, "когда основан эрмитаж? "), handle(log, "repeat"))])
+    assert log == [("start", "first"), ("end", "first")]
+    assert bot.sent == [(1, "Этот вопрос уже обрабатывается, ответ придёт одним сообщением.")]
+
+
+def test_stale_messages_are_processed_and_stale_repeats_coalesced():
+    bot, log = FakeBot(), []
+    processor = UserSerialUpdateProcessor(max_concurrent_updates=8, max_update_age=60)
+    run(processor, [(make_update(bot, 1, 1, "/start", age=600), handle(log, "start")),
+                    (make_update(bot, 2, 1, "Музеи", age=590), handle(log, "site")),
+                    (make_update(bot, 3, 1, "Как оформить отпуск?", age=580), handle(log, "question")),
+                    (make_update(bot, 4, 1, "Как оформить отпуск?", age=570), handle(log, "repeat"))])
+    assert [name for kind, name in log if kind == "end"] == ["start", "site", "question"]
+    assert bot.sent == []